@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+from nextcord.utils import utcnow
+
+_ids = itertools.count(10**17)
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str = None):
+        self.id = user_id
+        self.display_name = name or f"user{user_id}"
+        self.bot = False
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+class FakeMessage:
+    """Message stand-in that records edits; sends and edits cost `latency` seconds."""
+
+    def __init__(self, channel, content: str, author=None, reference=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.author = author
+        self.reference = reference
+        self.guild = channel.guild
+        self.created_at = utcnow()
+        self.edits = 0
+
+    async def edit(self, content: str = None, **kwargs):
+        await self.channel.pause()
+        self.content = content
+        self.edits += 1
+        self.channel.stats['edits'] += 1
+        if kwargs.get('file'):
+            self.channel.stats['files'] += 1
+        return self
+
+    async def delete(self):
+        await self.channel.pause()
+        self.channel.stats['deletes'] += 1
+
+    async def reply(self, content: str, **kwargs):
+        return await self.channel.send(content)
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeChannel:
+    def __init__(self, guild=None, latency: float = 0.0, stats: dict = None):
+        self.id = next(_ids)
+        self.guild = guild
+        self.latency = latency
+        self.stats = stats if stats is not None else {'sends': 0, 'edits': 0, 'deletes': 0, 'files': 0}
+        self.first_send_at = None
+
+    async def pause(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def send(self, content: str, **kwargs):
+        await self.pause()
+        self.stats['sends'] += 1
+        if kwargs.get('file'):
+            self.stats['files'] += 1
+        if self.first_send_at is None:
+            self.first_send_at = asyncio.get_running_loop().time()
+        return FakeMessage(self, content)
+
+    def typing(self):
+        return FakeTyping()
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        await self.interaction.channel.pause()
+        self._done = True
+
+    async def send_message(self, content: str, ephemeral: bool = False, **kwargs):
+        self._done = True
+        if ephemeral:
+            self.interaction.ephemeral.append(content)
+        self.interaction.original = await self.interaction.channel.send(content)
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content: str, wait: bool = False, **kwargs):
+        return await self.interaction.channel.send(content)
+
+class FakeInteraction:
+    """Enough of nextcord.Interaction for the cogs' slash command callbacks."""
+
+    def __init__(self, user: FakeUser, guild: FakeGuild, channel: FakeChannel):
+        self.id = next(_ids)
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id if guild else None
+        self.channel = channel
+        self.channel_id = channel.id
+        self.created_at = utcnow()
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+        self.ephemeral = []
+        self.original = None
+
+    async def original_message(self):
+        return self.original
+
+class FakeContext:
+    """Enough of commands.Context for the cogs' prefix command callbacks."""
+
+    def __init__(self, user: FakeUser, guild: FakeGuild, channel: FakeChannel, content: str):
+        self.author = user
+        self.guild = guild
+        self.channel = channel
+        self.message = FakeMessage(channel, content, author=user)
+
+    def typing(self):
+        return FakeTyping()
+
+    async def reply(self, content: str, **kwargs):
+        return await self.channel.send(content)
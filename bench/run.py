@@ -0,0 +1,219 @@
+"""Offline load test for LacriAI's command handlers.
+
+Drives the chat, math, program and weather cogs through fake Discord
+interactions and contexts while every provider points at a local stub
+server, then reports throughput, latency percentiles, peak memory and
+event-loop lag. Run from the repository root:
+
+    python -m bench.run --scenario chat --users 1000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import resource
+import time
+from utils.metrics import percentile
+
+SCENARIOS = {
+    'chat': [('chat', 'slash')],
+    'chat-prefix': [('chat', 'prefix')],
+    'math': [('math', 'slash')],
+    'program': [('program', 'slash')],
+    'weather': [('weather', 'slash')],
+    'weather-multi': [('weather', 'slash')],
+    'mixed': [('chat', 'slash'), ('chat', 'prefix'), ('math', 'slash'), ('program', 'slash'), ('weather', 'slash')],
+}
+
+COGS = {'chat': 'ChatCog', 'math': 'MathCog', 'program': 'Programming', 'weather': 'WeatherCog'}
+PARAMS = {'chat': 'message', 'math': 'message', 'program': 'prompt', 'weather': 'city'}
+PROMPTS = {
+    'chat': "how was your day, be honest {}",
+    'math': "what is the derivative of x^{}",
+    'program': "how do I reverse a list in python, variant {}",
+    'weather': "city {}",
+    'weather-multi': "city {0}; city {0}1; city {0}2 vs city {0}3",
+}
+
+def fmt(value) -> str:
+    return "n/a" if value is None else f"{value * 1000:.1f}ms"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='chat')
+    parser.add_argument('--users', type=int, default=1000, help="concurrent simulated users")
+    parser.add_argument('--requests', type=int, default=1, help="requests issued by each user, back to back")
+    parser.add_argument('--guilds', type=int, default=100, help="users are spread evenly over this many guilds")
+    parser.add_argument('--distinct-prompts', type=int, default=100, help="size of the prompt pool (smaller means more repeats)")
+    parser.add_argument('--think', type=float, default=0.0, help="pause between a user's requests, seconds")
+    parser.add_argument('--latency', type=float, default=0.3, help="stub upstream latency, seconds")
+    parser.add_argument('--jitter', type=float, default=0.1, help="uniform +/- jitter on the stub latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of stub requests answered with 503")
+    parser.add_argument('--tokens', type=int, default=120, help="tokens per stub completion")
+    parser.add_argument('--token-delay', type=float, default=0.005, help="delay between streamed tokens")
+    parser.add_argument('--discord-latency', type=float, default=0.05, help="simulated Discord REST latency")
+    parser.add_argument('--no-stream', action='store_true', help="disable streaming responses")
+    parser.add_argument('--verbose', action='store_true', help="show the bot's own output during the run")
+    parser.add_argument('--port', type=int, default=8800, help="port for the stub server")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="override any config environment variable, e.g. ADMISSION_QUEUE_SIZE=2000")
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Point every provider at the stub server before config is imported."""
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        'GROQ_API_URL': f"{base}/groq",
+        'TOGETHER_API_URL': f"{base}/together",
+        'SAMBANOVA_API_URL': f"{base}/sambanova",
+        'WEATHER_API_URL': f"{base}/weather",
+        'GROQ_API_KEY': 'bench',
+        'TOGETHER_API_KEY': 'bench',
+        'SAMBANOVA_API_KEY': 'bench',
+        'WEATHER_API_KEY': 'bench',
+        'STREAM_RESPONSES': 'false' if args.no_stream else 'true',
+    })
+    for item in args.set:
+        key, _, value = item.partition('=')
+        os.environ[key] = value
+
+def start_stub_server(args):
+    from bench.stubs import StubOptions, run_forever
+    options = StubOptions(args.latency, args.jitter, args.error_rate, args.tokens, args.token_delay)
+    process = multiprocessing.Process(target=run_forever, args=('127.0.0.1', args.port, options), daemon=True)
+    process.start()
+    return process
+
+async def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            await writer.wait_closed()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"stub server did not start on port {port}")
+            await asyncio.sleep(0.05)
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+async def invoke(bot, command: str, kind: str, user, guild, prompt: str, args, stats: dict):
+    from bench.fakes import FakeChannel, FakeContext, FakeInteraction
+    channel = FakeChannel(guild, args.discord_latency, stats)
+    cog = bot.get_cog(COGS[command])
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    if kind == 'slash':
+        interaction = FakeInteraction(user, guild, channel)
+        await getattr(cog, f"{command}_slash").callback(cog, interaction, **{PARAMS[command]: prompt})
+    else:
+        ctx = FakeContext(user, guild, channel, prompt)
+        await getattr(cog, command).callback(cog, ctx, **{PARAMS[command]: prompt})
+    end = loop.time()
+    first = channel.first_send_at - start if channel.first_send_at is not None else None
+    return end - start, first
+
+async def simulate_user(bot, index: int, args, results: dict, stats: dict):
+    from bench.fakes import FakeGuild, FakeUser
+    user = FakeUser(1000 + index)
+    guild = FakeGuild(1 + index % args.guilds)
+    choices = SCENARIOS[args.scenario]
+    for _ in range(args.requests):
+        command, kind = random.choice(choices)
+        prompt = PROMPTS.get(args.scenario, PROMPTS[command]).format(random.randrange(args.distinct_prompts))
+        try:
+            latency, first = await invoke(bot, command, kind, user, guild, prompt, args, stats)
+            results['latency'].append(latency)
+            if first is not None:
+                results['first_message'].append(first)
+        except Exception as e:
+            results['errors'].append(repr(e))
+        if args.think:
+            await asyncio.sleep(args.think)
+
+async def run(args):
+    from main import LacriAI
+    from utils.weather_api import weather_cache
+
+    await wait_for_port(args.port)
+    bot = LacriAI()
+    await bot.http_client.open()
+    await asyncio.gather(*(cache.load() for cache in bot.response_caches.values()))
+    if bot.state is not None:
+        bot.state.start()
+    bot.conversations.start()
+
+    results = {'latency': [], 'first_message': [], 'errors': []}
+    stats = {'sends': 0, 'edits': 0, 'deletes': 0, 'files': 0}
+    monitor = LoopLagMonitor()
+    monitor.start()
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.monotonic()
+    with output:
+        await asyncio.gather(*(simulate_user(bot, i, args, results, stats) for i in range(args.users)))
+    elapsed = time.monotonic() - started
+    await monitor.stop()
+
+    await bot.conversations.stop()
+    if bot.state is not None:
+        await bot.state.close()
+    await bot.http_client.close()
+
+    completed = len(results['latency'])
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"scenario          {args.scenario} ({args.users} users x {args.requests} requests, "
+          f"{'no stream' if args.no_stream else 'stream'})")
+    print(f"completed         {completed} in {elapsed:.2f}s -> {completed / elapsed:.1f} req/s")
+    print(f"latency           p50 {fmt(percentile(results['latency'], 0.5))}  "
+          f"p95 {fmt(percentile(results['latency'], 0.95))}  p99 {fmt(percentile(results['latency'], 0.99))}")
+    print(f"first message     p50 {fmt(percentile(results['first_message'], 0.5))}  "
+          f"p95 {fmt(percentile(results['first_message'], 0.95))}  p99 {fmt(percentile(results['first_message'], 0.99))}")
+    print(f"event loop lag    p50 {fmt(percentile(monitor.samples, 0.5))}  "
+          f"p99 {fmt(percentile(monitor.samples, 0.99))}  max {fmt(max(monitor.samples, default=None))}")
+    print(f"peak memory       {peak_rss_mb:.1f} MB")
+    print(f"discord calls     {stats['sends']} sends, {stats['edits']} edits, {stats['deletes']} deletes, {stats['files']} files")
+    print(f"admission         rejected {bot.admission.rejected}")
+    print(f"router            {bot.router.stats()}")
+    print(f"command outcomes  {bot.deadlines.stats()['outcomes']}")
+    print(f"weather cache     {weather_cache.stats()}")
+    if results['errors']:
+        print(f"handler errors    {len(results['errors'])} (first: {results['errors'][0]})")
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    stub = start_stub_server(args)
+    try:
+        asyncio.run(run(args))
+    finally:
+        stub.terminate()
+        stub.join()
+
+if __name__ == "__main__":
+    main()
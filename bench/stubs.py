@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import random
+from aiohttp import web
+
+WORDS = ("tonight's", "the", "night", "to", "analyze", "this", "problem", "carefully", "and", "methodically")
+
+class StubOptions:
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, error_rate: float = 0.0,
+                 tokens: int = 120, token_delay: float = 0.005, unknown_city_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.unknown_city_rate = unknown_city_rate
+
+class StubServer:
+    """Offline stand-in for the OpenAI-compatible LLM endpoints and OpenWeatherMap.
+
+    Every provider is served under /<provider>/chat/completions, with
+    configurable latency, jitter, error rate and streaming token cadence.
+    """
+
+    def __init__(self, options: StubOptions):
+        self.options = options
+        self.requests = 0
+        self.app = web.Application()
+        self.app.router.add_post('/{provider}/chat/completions', self.handle_completion)
+        self.app.router.add_get('/weather/weather', self.handle_weather)
+
+    async def delay(self):
+        jitter = random.uniform(-self.options.jitter, self.options.jitter)
+        await asyncio.sleep(max(0.0, self.options.latency + jitter))
+
+    def text(self) -> list:
+        return [random.choice(WORDS) + ' ' for _ in range(self.options.tokens)]
+
+    async def handle_completion(self, request):
+        self.requests += 1
+        body = await request.json()
+        await self.delay()
+        if random.random() < self.options.error_rate:
+            return web.Response(status=503, text="stub provider overloaded")
+
+        tokens = self.text()
+        usage = {'prompt_tokens': sum(len(m['content'].split()) for m in body['messages']),
+                 'completion_tokens': len(tokens)}
+        if not body.get('stream'):
+            return web.json_response({
+                'choices': [{'message': {'role': 'assistant', 'content': ''.join(tokens)}}],
+                'usage': usage
+            })
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        for token in tokens:
+            chunk = {'choices': [{'delta': {'content': token}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            if self.options.token_delay:
+                await asyncio.sleep(self.options.token_delay)
+        await response.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def handle_weather(self, request):
+        self.requests += 1
+        await self.delay()
+        if random.random() < self.options.error_rate:
+            return web.Response(status=503, text="stub weather overloaded")
+        if random.random() < self.options.unknown_city_rate:
+            return web.json_response({'cod': '404', 'message': 'city not found'}, status=404)
+        return web.json_response({
+            'main': {'temp': random.uniform(-5, 35), 'feels_like': random.uniform(-8, 38), 'humidity': random.randint(20, 95)},
+            'weather': [{'description': random.choice(("clear sky", "light rain", "overcast clouds"))}],
+            'wind': {'speed': round(random.uniform(0, 12), 1)}
+        })
+
+    async def serve(self, host: str, port: int):
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+def run_forever(host: str, port: int, options: StubOptions):
+    async def main():
+        await StubServer(options).serve(host, port)
+        await asyncio.Event().wait()
+    asyncio.run(main())
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline LLM and weather stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--tokens', type=int, default=120)
+    parser.add_argument('--token-delay', type=float, default=0.005)
+    args = parser.parse_args()
+    print(f"stub server listening on http://{args.host}:{args.port}")
+    run_forever(args.host, args.port, StubOptions(args.latency, args.jitter, args.error_rate, args.tokens, args.token_delay))
+
+if __name__ == "__main__":
+    main()
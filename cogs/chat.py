@@ -1,18 +1,17 @@
 from nextcord.ext import commands
 import nextcord
-from groq import Groq
-import asyncio
-from collections import defaultdict
-from datetime import datetime, timedelta
-from config import GROQ_API_KEY
+from utils.streaming import StreamingReply, interaction_sender
+from utils.admission import AdmissionRejected
+from utils.deadline import CommandCancelled
+from utils.metrics import track_command
+from utils.context import ContextBuilder
+from config import CHAT_CONTEXT_BUDGET
 
 class ChatCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.groq_client = Groq(api_key=GROQ_API_KEY)
-        self.conversations = defaultdict(list)
-        self.last_cleanup = datetime.now()
-        self.bot_messages = {}
+        self.conversations = bot.conversations
+        self.conversations.register('chat', max_turns=10)
         
         self.system_prompt = """you are lacri.ai, an AI that embodies the personality of Dexter Morgan.
 
@@ -48,58 +47,40 @@ class ChatCog(commands.Cog):
         - stay helpful while maintaining character
         - keep dark humor subtle and appropriate
         - use modern elements naturally, not forcefully"""
+        self.context_builder = ContextBuilder(self.system_prompt, CHAT_CONTEXT_BUDGET)
 
     def cog_unload(self):
-        self.conversations.clear()
-        self.bot_messages.clear()
+        self.conversations.clear('chat')
+        self.bot.reply_index.discard('chat')
 
     def add_to_conversation(self, user_id: int, message: str, is_user: bool = True):
-        self.conversations[user_id].append({
-            "role": "user" if is_user else "assistant",
-            "content": message,
-            "timestamp": datetime.now()
-        })
-        
-        self.conversations[user_id] = self.conversations[user_id][-10:]
-        
-        if datetime.now() - self.last_cleanup > timedelta(hours=1):
-            self.cleanup_conversations()
+        self.conversations.append('chat', user_id, "user" if is_user else "assistant", message)
 
-    def cleanup_conversations(self):
-        current_time = datetime.now()
-        for user_id in list(self.conversations.keys()):
-            self.conversations[user_id] = [
-                msg for msg in self.conversations[user_id]
-                if current_time - msg["timestamp"] < timedelta(hours=1)
-            ]
-            if not self.conversations[user_id]:
-                del self.conversations[user_id]
-        self.last_cleanup = current_time
-
-    def get_conversation_context(self, user_id: int) -> list:
-        return [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in self.conversations[user_id][-5:]
-        ]
+    def get_conversation_context(self, user_id: int, user_message: str = "") -> list:
+        return self.context_builder.fit(
+            self.conversations.history('chat', user_id),
+            self.conversations.summary('chat', user_id),
+            user_message,
+            self.conversations.recall('chat', user_id, user_message)
+        )
 
-    async def get_ai_response(self, user_message: str, user_id: int):
+    async def get_ai_response(self, user_message: str, user_id: int, reply=None, deadline=None):
         try:
-            messages = [{"role": "system", "content": self.system_prompt}]
-            context_messages = self.get_conversation_context(user_id)
+            messages = [{"role": "system", "content": self.context_builder.system_prompt}]
+            context_messages = self.get_conversation_context(user_id, user_message)
             messages.extend(context_messages)
             messages.append({"role": "user", "content": user_message})
 
-            completion = await asyncio.to_thread(
-                self.groq_client.chat.completions.create,
-                model="llama-3.3-70b-versatile",
+            response = await self.bot.router.generate(
+                "chat",
                 messages=messages,
+                reply=reply,
+                deadline=deadline,
                 temperature=0.7,
                 max_tokens=1000,
                 top_p=0.9,
             )
             
-            response = completion.choices[0].message.content.strip()
-            
             self.add_to_conversation(user_id, user_message, is_user=True)
             self.add_to_conversation(user_id, response, is_user=False)
             
@@ -110,17 +91,78 @@ class ChatCog(commands.Cog):
 
     @nextcord.slash_command(name='chat', description="Chat with lacri.ai in any language")
     async def chat_slash(self, interaction: nextcord.Interaction, message: str):
+        await self.conversations.prepare('chat', interaction.user.id)
+        try:
+            slot = self.bot.admission.admit('chat', interaction.user.id, interaction.guild_id)
+        except AdmissionRejected as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+
         await interaction.response.defer()
-        response = await self.get_ai_response(message, interaction.user.id)
-        await interaction.followup.send(
-            f"> **{interaction.user.display_name}:** {message}\n\n{response}"
+        reply = StreamingReply(
+            interaction_sender(interaction),
+            prefix=f"> **{interaction.user.display_name}:** {message}\n\n",
+            lane=self.bot.outbound.lane(interaction.channel_id)
         )
+        try:
+            async with self.bot.deadlines.scope('chat', interaction=interaction) as scope, slot:
+                response = await self.get_ai_response(message, interaction.user.id, reply=reply, deadline=scope.deadline)
+        except CommandCancelled as e:
+            response = e.notice(reply.received)
+            if response is None:
+                return
+        bot_messages = await reply.finish(response)
+        self.bot.reply_index.track(bot_messages, 'chat', interaction.user.id)
 
     @commands.command(name='chat')
     async def chat(self, ctx, *, message: str):
+        await self.conversations.prepare('chat', ctx.author.id)
+        try:
+            slot = self.bot.admission.admit('chat', ctx.author.id, ctx.guild.id if ctx.guild else None)
+        except AdmissionRejected as e:
+            await ctx.reply(str(e))
+            return
+
         async with ctx.typing():
-            response = await self.get_ai_response(message, ctx.author.id)
-            await ctx.reply(response)
+            reply = StreamingReply(ctx.reply, lane=self.bot.outbound.lane(ctx.channel.id))
+            try:
+                async with self.bot.deadlines.scope('chat', message=ctx.message) as scope, slot:
+                    response = await self.get_ai_response(message, ctx.author.id, reply=reply, deadline=scope.deadline)
+            except CommandCancelled as e:
+                response = e.notice(reply.received)
+                if response is None:
+                    return
+            bot_messages = await reply.finish(response)
+            self.bot.reply_index.track(bot_messages, 'chat', ctx.author.id)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.author.bot or message.content.startswith(self.bot.command_prefix):
+            return
+        if await self.bot.reply_index.lookup(message, 'chat') is None:
+            return
+
+        try:
+            await self.conversations.prepare('chat', message.author.id)
+            slot = self.bot.admission.admit('chat', message.author.id, message.guild.id if message.guild else None)
+            with track_command('chat', 'reply', message.created_at):
+                async with message.channel.typing():
+                    reply = StreamingReply(message.reply, lane=self.bot.outbound.lane(message.channel.id))
+                    try:
+                        async with self.bot.deadlines.scope('chat', message=message) as scope, slot:
+                            response = await self.get_ai_response(
+                                message.content, message.author.id, reply=reply, deadline=scope.deadline
+                            )
+                    except CommandCancelled as e:
+                        response = e.notice(reply.received)
+                        if response is None:
+                            return
+                    bot_messages = await reply.finish(response)
+                    self.bot.reply_index.track(bot_messages, 'chat', message.author.id)
+        except AdmissionRejected as e:
+            await message.reply(str(e))
+        except Exception as e:
+            print(f"Error handling reply: {str(e)}")
 
 def setup(bot):
     bot.add_cog(ChatCog(bot))
\ No newline at end of file
@@ -1,19 +1,29 @@
 from nextcord.ext import commands
 import nextcord
-from groq import Groq
-import asyncio
-from collections import defaultdict
-from datetime import datetime, timedelta
-from together import Together
-from config import TOGETHER_API_KEY
+from contextlib import nullcontext
+from utils.streaming import StreamingReply, interaction_sender
+from utils.admission import AdmissionRejected
+from utils.deadline import CommandCancelled
+from utils.metrics import track_command
+from utils.response_cache import ResponseCache
+from utils.context import ContextBuilder
+from utils.local_math import LocalMath
+from config import MATH_RESPONSE_CACHE, MATH_CONTEXT_BUDGET, MATH_LOCAL_ENABLED
 
 class MathCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.together_client = Together(api_key=TOGETHER_API_KEY)
-        self.conversations = defaultdict(list)
-        self.last_cleanup = datetime.now()
-        self.bot_messages = {}
+        self.conversations = bot.conversations
+        self.conversations.register('math', max_turns=10)
+        self.response_cache = ResponseCache('math') if MATH_RESPONSE_CACHE else None
+        if self.response_cache:
+            bot.response_caches['math'] = self.response_cache
+        self.local_math = LocalMath() if MATH_LOCAL_ENABLED else None
+        self.model_params = {
+            "temperature": 0.7,
+            "max_tokens": 512,
+            "top_p": 0.9,
+        }
         
         self.system_prompt = """you are lacri.ai, an AI that embodies the analytical, methodical, and calm personality traits of dexter morgan, a fictional character who is both meticulous and morally complex.
 
@@ -58,87 +68,167 @@ class MathCog(commands.Cog):
         - ensure accuracy in all explanations and solutions, emphasizing both the process and result
 
         """
+        self.context_builder = ContextBuilder(self.system_prompt, MATH_CONTEXT_BUDGET)
 
     def cog_unload(self):
-        self.conversations.clear()
-        self.bot_messages.clear()
+        self.conversations.clear('math')
+        self.bot.reply_index.discard('math')
+        if self.response_cache:
+            self.response_cache.save()
+            self.bot.response_caches.pop('math', None)
+        if self.local_math:
+            self.local_math.close()
 
     def add_to_conversation(self, user_id: int, message: str, is_user: bool = True):
-        self.conversations[user_id].append({
-            "role": "user" if is_user else "assistant",
-            "content": message,
-            "timestamp": datetime.now()
-        })
-        
-        self.conversations[user_id] = self.conversations[user_id][-10:]
-        
-        if datetime.now() - self.last_cleanup > timedelta(hours=1):
-            self.cleanup_conversations()
-
-    def cleanup_conversations(self):
-        current_time = datetime.now()
-        for user_id in list(self.conversations.keys()):
-            self.conversations[user_id] = [
-                msg for msg in self.conversations[user_id]
-                if current_time - msg["timestamp"] < timedelta(hours=1)
-            ]
-            if not self.conversations[user_id]:
-                del self.conversations[user_id]
-        self.last_cleanup = current_time
-
-    def get_conversation_context(self, user_id: int) -> list:
-        return [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in self.conversations[user_id][-5:]
-        ]
-
-    async def get_ai_response(self, user_message: str, user_id: int):
+        self.conversations.append('math', user_id, "user" if is_user else "assistant", message)
+
+    def get_conversation_context(self, user_id: int, user_message: str = "") -> list:
+        return self.context_builder.fit(
+            self.conversations.history('math', user_id),
+            self.conversations.summary('math', user_id),
+            user_message,
+            self.conversations.recall('math', user_id, user_message)
+        )
+
+    def plan(self, user_message: str, user_id: int):
+        """Build a prompt's context once and look it up: (context, cached answer or None)."""
+        context = self.get_conversation_context(user_id, user_message)
+        cached = self.response_cache.get(user_message, context, self.model_params) if self.response_cache else None
+        return context, cached
+
+    def local_problem(self, user_message: str):
+        """Classify a prompt the local engine can answer, or None to use the LLM."""
+        return self.local_math.classify(user_message) if self.local_math else None
+
+    async def get_ai_response(self, user_message: str, user_id: int, reply=None, deadline=None, problem=None,
+                              context=None, cached=None):
+        """Answer a prompt; `problem` is its `local_problem` classification, solved without the LLM.
+
+        `context` and `cached` are the prompt's `plan`, built here when not given.
+        """
         try:
-            messages = [{"role": "system", "content": self.system_prompt}]
-            context_messages = self.get_conversation_context(user_id)
-            messages.extend(context_messages)
+            if problem is not None:
+                response = await self.local_math.solve(problem)
+                self.add_to_conversation(user_id, user_message, is_user=True)
+                self.add_to_conversation(user_id, response, is_user=False)
+                return response
+
+            if context is None:
+                context, cached = self.plan(user_message, user_id)
+            messages = [{"role": "system", "content": self.context_builder.system_prompt}]
+            messages.extend(context)
             messages.append({"role": "user", "content": user_message})
 
-            completion = await asyncio.to_thread(
-                self.together_client.chat.completions.create,
-                model="Qwen/QwQ-32B-Preview",
-                messages=messages,
-                temperature=0.7,
-                repetition_penalty=1,
-                max_tokens=512,
-                top_p=0.9,
-                top_k=50,
-            )
-            
-            response = completion.choices[0].message.content.strip()
+            response = cached
+            if response is None:
+                response = await self.bot.router.generate(
+                    "math",
+                    messages=messages,
+                    reply=reply,
+                    deadline=deadline,
+                    **self.model_params
+                )
+                if self.response_cache and response:
+                    self.response_cache.set(user_message, context, self.model_params, response)
             
             self.add_to_conversation(user_id, user_message, is_user=True)
             self.add_to_conversation(user_id, response, is_user=False)
-            print(response)
             return response
         except Exception as e:
             print(f"Error getting AI response: {str(e)}")
             return "something went wrong... let me collect my thoughts and try again."
 
+    def admit(self, problem, cached, user_id: int, guild_id: int = None):
+        """Reserve a provider slot, or a no-op one when the answer is local or already cached."""
+        if problem is not None or cached is not None:
+            return nullcontext()
+        return self.bot.admission.admit('math', user_id, guild_id)
+
     @nextcord.slash_command(name='math', description="solve math with lacri.ai")
     async def math_slash(self, interaction: nextcord.Interaction, message: str):
-        await interaction.response.defer()
-        response = await self.get_ai_response(message, interaction.user.id)
-        if len(response) > 2000:
-            for i in range(0, len(response), 2000):
-                await interaction.followup.send(response[i:i+2000])
-        else:
-            await interaction.followup.send(response)
+        await self.conversations.prepare('math', interaction.user.id)
+        problem = self.local_problem(message)
+        context, cached = self.plan(message, interaction.user.id) if problem is None else (None, None)
+        try:
+            slot = self.admit(problem, cached, interaction.user.id, interaction.guild_id)
+        except AdmissionRejected as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+
+        # a cold local engine spawns its workers first, which can outlast the interaction window
+        if not isinstance(slot, nullcontext) or (problem is not None and not self.local_math.ready):
+            await interaction.response.defer()
+        reply = StreamingReply(interaction_sender(interaction), lane=self.bot.outbound.lane(interaction.channel_id))
+        try:
+            async with self.bot.deadlines.scope('math', interaction=interaction) as scope, slot:
+                response = await self.get_ai_response(
+                    message, interaction.user.id, reply=reply, deadline=scope.deadline, problem=problem,
+                    context=context, cached=cached
+                )
+        except CommandCancelled as e:
+            response = e.notice(reply.received)
+            if response is None:
+                return
+        bot_messages = await reply.finish(response)
+        self.bot.reply_index.track(bot_messages, 'math', interaction.user.id)
 
     @commands.command(name='math')
     async def math(self, ctx, *, message: str):
+        await self.conversations.prepare('math', ctx.author.id)
+        problem = self.local_problem(message)
+        context, cached = self.plan(message, ctx.author.id) if problem is None else (None, None)
+        try:
+            slot = self.admit(problem, cached, ctx.author.id, ctx.guild.id if ctx.guild else None)
+        except AdmissionRejected as e:
+            await ctx.reply(str(e))
+            return
+
         async with ctx.typing():
-            response = await self.get_ai_response(message, ctx.author.id)
-            if len(response) > 2000:
-                for i in range(0, len(response), 2000):
-                    await ctx.reply(response[i:i+2000])
-            else:
-                await ctx.reply(response)
+            reply = StreamingReply(ctx.reply, lane=self.bot.outbound.lane(ctx.channel.id))
+            try:
+                async with self.bot.deadlines.scope('math', message=ctx.message) as scope, slot:
+                    response = await self.get_ai_response(
+                        message, ctx.author.id, reply=reply, deadline=scope.deadline, problem=problem,
+                        context=context, cached=cached
+                    )
+            except CommandCancelled as e:
+                response = e.notice(reply.received)
+                if response is None:
+                    return
+            bot_messages = await reply.finish(response)
+            self.bot.reply_index.track(bot_messages, 'math', ctx.author.id)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.author.bot or message.content.startswith(self.bot.command_prefix):
+            return
+        if await self.bot.reply_index.lookup(message, 'math') is None:
+            return
+
+        try:
+            await self.conversations.prepare('math', message.author.id)
+            problem = self.local_problem(message.content)
+            context, cached = self.plan(message.content, message.author.id) if problem is None else (None, None)
+            slot = self.admit(problem, cached, message.author.id, message.guild.id if message.guild else None)
+            with track_command('math', 'reply', message.created_at):
+                async with message.channel.typing():
+                    reply = StreamingReply(message.reply, lane=self.bot.outbound.lane(message.channel.id))
+                    try:
+                        async with self.bot.deadlines.scope('math', message=message) as scope, slot:
+                            response = await self.get_ai_response(
+                                message.content, message.author.id, reply=reply, deadline=scope.deadline,
+                                problem=problem, context=context, cached=cached
+                            )
+                    except CommandCancelled as e:
+                        response = e.notice(reply.received)
+                        if response is None:
+                            return
+                    bot_messages = await reply.finish(response)
+                    self.bot.reply_index.track(bot_messages, 'math', message.author.id)
+        except AdmissionRejected as e:
+            await message.reply(str(e))
+        except Exception as e:
+            print(f"Error handling reply: {str(e)}")
 
 def setup(bot):
     bot.add_cog(MathCog(bot))
\ No newline at end of file
@@ -1,23 +1,29 @@
 from nextcord.ext import commands
 import nextcord
-import aiohttp
-import json
-import asyncio
-from datetime import datetime, timedelta
-from collections import defaultdict
-from config import SAMBANOVA_API_KEY
+from contextlib import nullcontext
+from utils.router import RoutingError
+from utils.streaming import StreamingReply, interaction_sender
+from utils.code_format import CodeFormatter
+from utils.admission import AdmissionRejected
+from utils.deadline import CommandCancelled
+from utils.metrics import track_command
+from utils.response_cache import ResponseCache
+from utils.context import ContextBuilder
+from config import PROGRAM_RESPONSE_CACHE, PROGRAM_CONTEXT_BUDGET
 
 class ProgramCog(commands.Cog, name="Programming"):
     def __init__(self, bot):
         self.bot = bot
-        self.api_key = SAMBANOVA_API_KEY
-        self.base_url = "https://api.sambanova.ai/v1/completions"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+        self.conversations = bot.conversations
+        self.conversations.register('program', max_turns=5)
+        self.response_cache = ResponseCache('program') if PROGRAM_RESPONSE_CACHE else None
+        if self.response_cache:
+            bot.response_caches['program'] = self.response_cache
+        self.model_params = {
+            "temperature": 0.7,
+            "max_tokens": 2048,
+            "top_p": 0.9
         }
-        self.conversations = defaultdict(list)
-        self.bot_messages = {}
         
         self.system_prompt = """you are lacri.ai, an AI programming assistant that embodies the personality of Dexter Morgan while helping with code.
 
@@ -40,141 +46,171 @@ class ProgramCog(commands.Cog, name="Programming"):
         - be protective of code quality and best practices
         - provide detailed comments and documentation
         - think step by step through problems"""
+        self.context_builder = ContextBuilder(self.system_prompt, PROGRAM_CONTEXT_BUDGET)
 
     def cog_unload(self):
-        self.conversations.clear()
-        self.bot_messages.clear()
+        self.conversations.clear('program')
+        self.bot.reply_index.discard('program')
+        if self.response_cache:
+            self.response_cache.save()
+            self.bot.response_caches.pop('program', None)
 
-    async def get_sambanova_response(self, user_message: str, user_id: int):
+    def plan(self, user_message: str, user_id: int):
+        """Build a prompt's context once and look it up: (context, cached answer or None)."""
+        context = self.get_conversation_context(user_id, user_message)
+        cached = self.response_cache.get(user_message, context, self.model_params) if self.response_cache else None
+        return context, cached
+
+    async def get_sambanova_response(self, user_message: str, user_id: int, reply=None, deadline=None,
+                                     context=None, cached=None):
+        """Answer a prompt; `context` and `cached` are its `plan`, built here when not given."""
         try:
-            context = self.get_conversation_context(user_id)
+            if context is None:
+                context, cached = self.plan(user_message, user_id)
             
             messages = [
-                {"role": "system", "content": self.system_prompt},
-                *[{"role": msg["role"], "content": msg["content"]} for msg in context],
+                {"role": "system", "content": self.context_builder.system_prompt},
+                *context,
                 {"role": "user", "content": user_message}
             ]
             
-            payload = {
-                "model": "Qwen2.5-Coder-32B-Instruct",
-                "prompt": user_message,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 2048,
-                "top_p": 0.9
-            }
+            ai_response = cached
+            if ai_response is None:
+                ai_response = await self.bot.router.generate(
+                    "program",
+                    messages=messages,
+                    reply=reply,
+                    deadline=deadline,
+                    **self.model_params
+                )
+                if not ai_response:
+                    return "no response received... the trail went cold."
+                if self.response_cache:
+                    self.response_cache.set(user_message, context, self.model_params, ai_response)
+            
+            self.add_to_conversation(user_id, user_message, is_user=True)
+            self.add_to_conversation(user_id, ai_response, is_user=False)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.base_url, headers=self.headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        ai_response = result['choices'][0]['text']
-                        
-                        self.add_to_conversation(user_id, user_message, is_user=True)
-                        self.add_to_conversation(user_id, ai_response, is_user=False)
-                        
-                        return ai_response
-                    else:
-                        error_text = await response.text()
-                        print(f"SambaNova API error: {error_text}")
-                        return f"failed to retrieve response. status code: {response.status}"
+            return ai_response
 
+        except RoutingError as e:
+            print(f"Programming providers failed: {str(e)}")
+            statuses = ', '.join(str(error.status) for _, error in e.errors if hasattr(error, 'status'))
+            return f"failed to retrieve response. status code: {statuses or 'unavailable'}"
         except Exception as e:
             print(f"Error getting SambaNova response: {str(e)}")
             return "tonight's debugging session hit a snag. let me regroup and try again."
 
     def add_to_conversation(self, user_id: int, message: str, is_user: bool = True):
-        self.conversations[user_id].append({
-            "role": "user" if is_user else "assistant",
-            "content": message,
-            "timestamp": datetime.now()
-        })
-        
-        self.conversations[user_id] = self.conversations[user_id][-5:]
+        self.conversations.append('program', user_id, "user" if is_user else "assistant", message)
 
-    def get_conversation_context(self, user_id: int) -> list:
-        return self.conversations[user_id]
+    def get_conversation_context(self, user_id: int, user_message: str = "") -> list:
+        return self.context_builder.fit(
+            self.conversations.history('program', user_id),
+            self.conversations.summary('program', user_id),
+            user_message,
+            self.conversations.recall('program', user_id, user_message)
+        )
+
+    def admit(self, cached, user_id: int, guild_id: int = None):
+        """Reserve a provider slot, or a no-op one when the answer is already cached."""
+        if cached is not None:
+            return nullcontext()
+        return self.bot.admission.admit('program', user_id, guild_id)
 
     @nextcord.slash_command(name="program", description="get programming help from lacri.ai")
     async def program_slash(self, interaction: nextcord.Interaction, prompt: str):
-        await interaction.response.defer()
-        response = await self.get_sambanova_response(prompt, interaction.user.id)
-        
-        formatted_response = self.format_code_response(response)
-        
-        bot_message = await interaction.followup.send(
-            f"> **{interaction.user.display_name}:** {prompt}\n\n{formatted_response}",
-            wait=True
+        await self.conversations.prepare('program', interaction.user.id)
+        context, cached = self.plan(prompt, interaction.user.id)
+        try:
+            slot = self.admit(cached, interaction.user.id, interaction.guild_id)
+        except AdmissionRejected as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+
+        if not isinstance(slot, nullcontext):
+            await interaction.response.defer()
+        reply = StreamingReply(
+            interaction_sender(interaction),
+            prefix=f"> **{interaction.user.display_name}:** {prompt}\n\n",
+            lane=self.bot.outbound.lane(interaction.channel_id),
+            formatter=CodeFormatter
         )
-        
-        self.bot_messages[bot_message.id] = {
-            'user_id': interaction.user.id,
-            'timestamp': datetime.now()
-        }
+        try:
+            async with self.bot.deadlines.scope('program', interaction=interaction) as scope, slot:
+                response = await self.get_sambanova_response(
+                    prompt, interaction.user.id, reply=reply, deadline=scope.deadline, context=context, cached=cached
+                )
+        except CommandCancelled as e:
+            response = e.notice(reply.received)
+            if response is None:
+                return
+        bot_messages = await reply.finish(response)
+        self.bot.reply_index.track(bot_messages, 'program', interaction.user.id)
 
     @commands.command(name='program')
     async def program(self, ctx, *, prompt: str):
         """Get programming help from lacri.ai"""
+        await self.conversations.prepare('program', ctx.author.id)
+        context, cached = self.plan(prompt, ctx.author.id)
+        try:
+            slot = self.admit(cached, ctx.author.id, ctx.guild.id if ctx.guild else None)
+        except AdmissionRejected as e:
+            await ctx.reply(str(e))
+            return
+
         async with ctx.typing():
-            response = await self.get_sambanova_response(prompt, ctx.author.id)
-            
-            formatted_response = self.format_code_response(response)
-            
-            bot_message = await ctx.reply(formatted_response)
-            self.bot_messages[bot_message.id] = {
-                'user_id': ctx.author.id,
-                'timestamp': datetime.now()
-            }
-
-    def format_code_response(self, response: str) -> str:
-        """Format response to properly display code blocks in Discord"""
-
-        if response is None:
-            return "No response received from SambaNova."
-    
-        if "```" not in response:
-            lines = response.split('\n')
-            in_code = False
-            formatted_lines = []
-            
-            for line in lines:
-                if (line.strip().startswith(('def ', 'class ', 'if ', 'for ', 'while ', 
-                    'import ', 'from ', 'return ', '#', '//', '/*', '{', '}')) and not in_code):
-                    formatted_lines.append('```python')
-                    in_code = True
-                elif in_code and line.strip() == '' and len(formatted_lines) > 0:
-                    formatted_lines.append('```')
-                    in_code = False
-                
-                formatted_lines.append(line)
-            
-            if in_code:
-                formatted_lines.append('```')
-            
-            return '\n'.join(formatted_lines)
-        
-        return response
+            reply = StreamingReply(
+                ctx.reply,
+                lane=self.bot.outbound.lane(ctx.channel.id),
+                formatter=CodeFormatter
+            )
+            try:
+                async with self.bot.deadlines.scope('program', message=ctx.message) as scope, slot:
+                    response = await self.get_sambanova_response(
+                        prompt, ctx.author.id, reply=reply, deadline=scope.deadline, context=context, cached=cached
+                    )
+            except CommandCancelled as e:
+                response = e.notice(reply.received)
+                if response is None:
+                    return
+            bot_messages = await reply.finish(response)
+            self.bot.reply_index.track(bot_messages, 'program', ctx.author.id)
 
     @commands.Cog.listener()
     async def on_message(self, message):
-        if message.author == self.bot.user:
+        if message.author.bot or message.content.startswith(self.bot.command_prefix):
+            return
+        if await self.bot.reply_index.lookup(message, 'program') is None:
             return
 
-        if message.reference and message.reference.message_id:
-            try:
-                replied_to = await message.channel.fetch_message(message.reference.message_id)
-                if replied_to.author == self.bot.user and replied_to.id in self.bot_messages:
-                    async with message.channel.typing():
-                        response = await self.get_sambanova_response(message.content, message.author.id)
-                        formatted_response = self.format_code_response(response)
-                        bot_response = await message.reply(formatted_response)
-                        
-                        self.bot_messages[bot_response.id] = {
-                            'user_id': message.author.id,
-                            'timestamp': datetime.now()
-                        }
-            except Exception as e:
-                print(f"Error handling reply: {str(e)}")
+        try:
+            await self.conversations.prepare('program', message.author.id)
+            context, cached = self.plan(message.content, message.author.id)
+            slot = self.admit(cached, message.author.id, message.guild.id if message.guild else None)
+            with track_command('program', 'reply', message.created_at):
+                async with message.channel.typing():
+                    reply = StreamingReply(
+                        message.reply,
+                        lane=self.bot.outbound.lane(message.channel.id),
+                        formatter=CodeFormatter
+                    )
+                    try:
+                        async with self.bot.deadlines.scope('program', message=message) as scope, slot:
+                            response = await self.get_sambanova_response(
+                                message.content, message.author.id, reply=reply, deadline=scope.deadline,
+                                context=context, cached=cached
+                            )
+                    except CommandCancelled as e:
+                        response = e.notice(reply.received)
+                        if response is None:
+                            return
+                    bot_messages = await reply.finish(response)
+                    self.bot.reply_index.track(bot_messages, 'program', message.author.id)
+        except AdmissionRejected as e:
+            await message.reply(str(e))
+        except Exception as e:
+            print(f"Error handling reply: {str(e)}")
 
 def setup(bot):
     bot.add_cog(ProgramCog(bot))
\ No newline at end of file
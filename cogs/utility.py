@@ -1,13 +1,51 @@
 from nextcord.ext import commands
+import asyncio
+import math
 import nextcord
+from config import PROFILE_MAX_SECONDS
+from utils.metrics import (
+    COMMAND_LATENCY,
+    COMMANDS_IN_FLIGHT,
+    PROVIDER_LATENCY,
+    PROVIDER_ERRORS,
+    PROVIDER_IN_FLIGHT,
+    TOKENS,
+)
+from utils.streaming import split_message
+
+def format_seconds(value) -> str:
+    return "n/a" if value is None else f"{value:.2f}s"
+
+def format_ms(value) -> str:
+    return "n/a" if value is None else f"{value * 1000:.1f}ms"
+
+async def send_ephemeral(interaction: nextcord.Interaction, text: str):
+    """Send text only the invoking user sees, split over as many messages as it needs."""
+    for chunk in split_message(text):
+        if interaction.response.is_done():
+            await interaction.followup.send(chunk, ephemeral=True)
+        else:
+            await interaction.response.send_message(chunk, ephemeral=True)
+
+def format_shard(health: dict) -> str:
+    if not health['up'] or math.isnan(health['latency']):
+        return "down"
+    return f"{round(health['latency'] * 1000)}ms"
 
 class UtilityCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.profile_report = None
 
     def cog_unload(self):
-        self.conversations.clear()
-        self.bot_messages.clear()
+        if self.bot.profiler.running:
+            self.bot.profiler.stop()
+        self.cancel_profile_report()
+
+    def cancel_profile_report(self):
+        if self.profile_report is not None and not self.profile_report.done():
+            self.profile_report.cancel()
+        self.profile_report = None
 
     @nextcord.slash_command(name='ping', description="Check bot latency")
     async def ping_slash(self, interaction: nextcord.Interaction):
@@ -19,5 +57,148 @@ class UtilityCog(commands.Cog):
     async def ping(self, ctx):
         await ctx.reply(f"*checking response time*... {round(self.bot.latency * 1000)}ms")
 
+    def build_stats(self) -> str:
+        lines = ["> **lacri.ai stats**", "**commands** (p50 / p95 / count)"]
+        for command, kind in sorted(COMMAND_LATENCY.keys()):
+            labels = {'command': command, 'kind': kind}
+            lines.append(
+                f"- {command} [{kind}]: {format_seconds(COMMAND_LATENCY.quantile(0.5, **labels))} / "
+                f"{format_seconds(COMMAND_LATENCY.quantile(0.95, **labels))} / {COMMAND_LATENCY.count(**labels)}"
+            )
+
+        errors = {}
+        for (provider, _), count in PROVIDER_ERRORS.items():
+            errors[provider] = errors.get(provider, 0) + count
+        lines.append("**providers** (p95 / calls / errors / breaker)")
+        for provider, mode in sorted(PROVIDER_LATENCY.keys()):
+            labels = {'provider': provider, 'mode': mode}
+            breaker = self.bot.router.breakers.get(provider)
+            lines.append(
+                f"- {provider} [{mode}]: {format_seconds(PROVIDER_LATENCY.quantile(0.95, **labels))} / "
+                f"{PROVIDER_LATENCY.count(**labels)} / {errors.get(provider, 0)}"
+                + (f" / {breaker.state}" if breaker else "")
+            )
+
+        tokens = {}
+        for (provider, kind), count in TOKENS.items():
+            tokens[kind] = tokens.get(kind, 0) + count
+        lines.append(
+            f"**tokens**: prompt {int(tokens.get('prompt', 0))}, completion {int(tokens.get('completion', 0))}"
+        )
+        lines.append(
+            f"**in flight**: commands {int(sum(value for _, value in COMMANDS_IN_FLIGHT.items()))}, "
+            f"provider calls {int(sum(value for _, value in PROVIDER_IN_FLIGHT.items()))}"
+        )
+
+        cache_parts = []
+        for name, stats in self.bot.cache_stats().items():
+            lookups = stats['hits'] + stats['misses'] + stats.get('coalesced', 0)
+            served = stats['hits'] + stats.get('coalesced', 0)
+            ratio = f"{served / lookups:.0%}" if lookups else "n/a"
+            cache_parts.append(f"{name} {ratio} ({stats['size']} entries)")
+        lines.append(f"**caches**: {', '.join(cache_parts)}")
+
+        local_math = self.bot.local_math_stats()
+        if local_math is not None:
+            lines.append(f"**local math**: {local_math['solved']} solved, {local_math['timeouts']} timed out")
+        digests = self.bot.weather_digests.stats()
+        lines.append(
+            f"**weather digests**: {digests['tracked_cities']} cities tracked, {digests['hot_cities']} hot, "
+            f"{digests['refreshed']} refreshed, {digests['refresh_errors']} refresh errors"
+        )
+        conversations = self.bot.conversations.stats()
+        lines.append(
+            f"**conversations**: {conversations['histories']} histories, {conversations['turns']} turns, "
+            f"{conversations['chars']} chars; summarised {conversations['overflow_evictions']}, "
+            f"expired {conversations['expired_turns']}, evicted {conversations['cap_evictions']}"
+            + (f"; {conversations['db']['pending']} writes pending, {conversations['db']['dropped']} dropped"
+               if 'db' in conversations else "")
+        )
+
+        memory = conversations.get('memory')
+        if memory is not None:
+            lines.append(
+                f"**memory**: {memory['exchanges']} exchanges from {memory['users']} users "
+                f"({memory['bytes'] / 1048576:.1f} MB), recalled something for {memory['hits']}/{memory['searches']} prompts"
+            )
+
+        outcomes = self.bot.deadlines.stats()['outcomes']
+        if outcomes:
+            lines.append(
+                f"**outcomes**: {', '.join(f'{outcome} {count}' for outcome, count in sorted(outcomes.items()))}"
+            )
+
+        queue_parts = [
+            f"{name} depth {queue.depth}, avg wait {format_seconds(queue.stats()['avg_wait'])}"
+            for name, queue in self.bot.admission.queues.items()
+        ]
+        lines.append(f"**queues**: {'; '.join(queue_parts)}")
+        outbound = self.bot.outbound.stats()
+        lines.append(
+            f"**outbound**: {outbound['calls']} calls, {outbound['paced']} paced "
+            f"(avg wait {format_seconds(outbound['avg_wait'])}), {outbound['attachments']} sent as files"
+        )
+        shard_parts = [
+            f"{shard_id} {format_shard(health)} ({health['guilds']} guilds)"
+            for shard_id, health in sorted(self.bot.shard_health().items())
+        ]
+        lines.append(f"**gateway shards**: {', '.join(shard_parts)}")
+        loop = self.bot.loop_monitor.stats()
+        lines.append(
+            f"**event loop**: lag p50 {format_ms(loop['p50'])}, p99 {format_ms(loop['p99'])}, "
+            f"max {format_ms(loop['max'])}, {loop['blocks']} blocking stalls"
+        )
+        return '\n'.join(lines)
+
+    @nextcord.slash_command(
+        name='stats',
+        description="Show latency, provider and cache statistics",
+        default_member_permissions=nextcord.Permissions(administrator=True),
+        dm_permission=False
+    )
+    async def stats_slash(self, interaction: nextcord.Interaction):
+        await send_ephemeral(interaction, self.build_stats())
+
+    @nextcord.slash_command(
+        name='profile',
+        description="Sample the event loop to find blocking code",
+        default_member_permissions=nextcord.Permissions(administrator=True),
+        dm_permission=False
+    )
+    async def profile_slash(self, interaction: nextcord.Interaction):
+        pass
+
+    @profile_slash.subcommand(name='start', description="Start sampling the event loop for a number of seconds")
+    async def profile_start(
+        self,
+        interaction: nextcord.Interaction,
+        seconds: int = nextcord.SlashOption(
+            description="How long to sample", min_value=1, max_value=PROFILE_MAX_SECONDS, default=30
+        )
+    ):
+        if self.bot.profiler.running:
+            await interaction.response.send_message("a profile is already running.", ephemeral=True)
+            return
+
+        def finished(path: str, summary: str):
+            # keep a reference so the report isn't garbage-collected before it is sent
+            self.profile_report = asyncio.create_task(send_ephemeral(
+                interaction, f"> **profile finished**\nsaved to `{path}`\n{summary}"
+            ))
+
+        self.bot.profiler.start(seconds, on_finish=finished)
+        await interaction.response.send_message(
+            f"*sampling the event loop for {seconds}s*... i'll report back.", ephemeral=True
+        )
+
+    @profile_slash.subcommand(name='stop', description="Stop the running profile early and save it")
+    async def profile_stop(self, interaction: nextcord.Interaction):
+        if not self.bot.profiler.running:
+            await interaction.response.send_message("no profile is running.", ephemeral=True)
+            return
+        path, summary = self.bot.profiler.stop()
+        self.cancel_profile_report()
+        await send_ephemeral(interaction, f"> **profile stopped**\nsaved to `{path}`\n{summary}")
+
 def setup(bot):
-    bot.add_cog(UtilityCog(bot))
\ No newline at end of file
+    bot.add_cog(UtilityCog(bot))
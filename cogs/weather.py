@@ -1,54 +1,84 @@
 from nextcord.ext import commands
 import nextcord
-from utils.weather_api import get_weather
+from contextlib import nullcontext
+from utils.admission import AdmissionRejected
+from utils.streaming import StreamingReply, interaction_sender
+from utils.weather_api import WeatherUnavailable
+from config import WEATHER_MAX_CITIES
+
+NOT_FOUND = "hmm... i couldn't find that location in my database. are you sure it exists?"
+UNAVAILABLE = "the weather service isn't answering right now... try again in a bit."
 
 class WeatherCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.digests = bot.weather_digests
 
-    def cog_unload(self):
-        self.conversations.clear()
-        self.bot_messages.clear()
-        
-    @nextcord.slash_command(name='weather', description="Check weather for a city")
-    async def weather_slash(self, interaction: nextcord.Interaction, city: str):
-        await interaction.response.defer()
-        
-        weather_data = await get_weather(city)
-        if weather_data:
-            # Get the ChatCog instance to use its AI response
-            chat_cog = self.bot.get_cog('ChatCog')
-            if chat_cog:
-                response = await chat_cog.get_ai_response(
-                    f"analyze the current weather in {city}",
-                    interaction.user.id
-                )
-                await interaction.followup.send(
-                    f"> **{interaction.user.display_name}:** /weather {city}\n\n{response}"
-                )
-            else:
-                await interaction.followup.send("chat system is currently unavailable.")
+    def admit(self, cities: list, user_id: int, guild_id: int = None):
+        """Reserve a provider slot, or a no-op one when the digest is already cached."""
+        cities = cities[:WEATHER_MAX_CITIES]
+        if self.digests.ready(cities[0]) if len(cities) == 1 else self.digests.ready_group(cities):
+            return nullcontext()
+        return self.bot.admission.admit('chat', user_id, guild_id)
+
+    async def build_report(self, cities: list, slot) -> str:
+        cities, skipped = cities[:WEATHER_MAX_CITIES], cities[WEATHER_MAX_CITIES:]
+        if len(cities) == 1:
+            try:
+                result = await self.digests.get(cities[0], slot)
+                report = NOT_FOUND if result is None else self.digests.render(cities[0], *result)
+            except WeatherUnavailable:
+                report = UNAVAILABLE
         else:
-            await interaction.followup.send(
-                f"> **{interaction.user.display_name}:** /weather {city}\n\nhmm... i couldn't find that location in my database. are you sure it exists?"
-            )
+            result = await self.digests.get_group(cities, slot)
+            report = NOT_FOUND if result is None else self.digests.render_group(*result)
+        if skipped:
+            report += f"\n\n*i only check {WEATHER_MAX_CITIES} cities at a time... skipped {', '.join(skipped)}.*"
+        return report
+
+    @nextcord.slash_command(name='weather', description="Check weather for a city, or compare several")
+    async def weather_slash(
+        self,
+        interaction: nextcord.Interaction,
+        city: str = nextcord.SlashOption(description="A city, or several separated by commas or semicolons")
+    ):
+        cities = self.digests.resolve_cached(city)
+        if cities is None:
+            # resolving needs upstream lookups; the slot is only charged if a digest still has to be built
+            await interaction.response.defer()
+            cities = await self.digests.resolve(city)
+        try:
+            slot = self.admit(cities, interaction.user.id, interaction.guild_id)
+        except AdmissionRejected as e:
+            if interaction.response.is_done():
+                await interaction.followup.send(str(e))
+            else:
+                await interaction.response.send_message(str(e), ephemeral=True)
+            return
+
+        if not isinstance(slot, nullcontext) and not interaction.response.is_done():
+            await interaction.response.defer()
+        report = await self.build_report(cities, slot)
+        reply = StreamingReply(
+            interaction_sender(interaction),
+            prefix=f"> **{interaction.user.display_name}:** /weather {city}\n\n",
+            lane=self.bot.outbound.lane(interaction.channel_id)
+        )
+        await reply.finish(report)
 
     @commands.command(name='weather')
     async def weather(self, ctx, *, city: str):
+        cities = self.digests.resolve_cached(city) or await self.digests.resolve(city)
+        try:
+            slot = self.admit(cities, ctx.author.id, ctx.guild.id if ctx.guild else None)
+        except AdmissionRejected as e:
+            await ctx.reply(str(e))
+            return
+
         async with ctx.typing():
-            weather_data = await get_weather(city)
-            if weather_data:
-                chat_cog = self.bot.get_cog('ChatCog')
-                if chat_cog:
-                    response = await chat_cog.get_ai_response(
-                        f"analyze the current weather in {city}",
-                        ctx.author.id
-                    )
-                    await ctx.reply(response)
-                else:
-                    await ctx.reply("chat system is currently unavailable.")
-            else:
-                await ctx.reply("hmm... i couldn't find that location in my database. are you sure it exists?")
+            report = await self.build_report(cities, slot)
+            reply = StreamingReply(ctx.reply, lane=self.bot.outbound.lane(ctx.channel.id))
+            await reply.finish(report)
 
 def setup(bot):
-    bot.add_cog(WeatherCog(bot))
\ No newline at end of file
+    bot.add_cog(WeatherCog(bot))
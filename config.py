@@ -12,4 +12,145 @@ SAMBANOVA_API_KEY = os.getenv('SAMBANOVA_API_KEY')
 TOGETHER_API_KEY = os.getenv('TOGETHER_API_KEY')
 
 # Bot settings
-COMMAND_PREFIX = "!"
\ No newline at end of file
+COMMAND_PREFIX = "!"
+
+# HTTP client settings (shared connection pool for all outbound API calls)
+HTTP_TOTAL_TIMEOUT = float(os.getenv('HTTP_TOTAL_TIMEOUT', 60))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 30))
+
+# LLM provider settings (OpenAI-compatible chat completion endpoints)
+GROQ_API_URL = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1')
+TOGETHER_API_URL = os.getenv('TOGETHER_API_URL', 'https://api.together.xyz/v1')
+SAMBANOVA_API_URL = os.getenv('SAMBANOVA_API_URL', 'https://api.sambanova.ai/v1')
+GROQ_MAX_CONCURRENCY = int(os.getenv('GROQ_MAX_CONCURRENCY', 16))
+TOGETHER_MAX_CONCURRENCY = int(os.getenv('TOGETHER_MAX_CONCURRENCY', 8))
+SAMBANOVA_MAX_CONCURRENCY = int(os.getenv('SAMBANOVA_MAX_CONCURRENCY', 8))
+
+# Streaming settings (progressive message edits while a completion is generated)
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'true').lower() == 'true'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.2))
+DISCORD_MESSAGE_LIMIT = 2000
+
+# Weather API settings
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'http://api.openweathermap.org/data/2.5')
+WEATHER_CACHE_TTL = float(os.getenv('WEATHER_CACHE_TTL', 600))
+WEATHER_CACHE_NEGATIVE_TTL = float(os.getenv('WEATHER_CACHE_NEGATIVE_TTL', 300))
+WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', 1024))
+WEATHER_DIGEST_TTL = float(os.getenv('WEATHER_DIGEST_TTL', 900))
+WEATHER_DIGEST_CACHE_SIZE = int(os.getenv('WEATHER_DIGEST_CACHE_SIZE', 2048))
+WEATHER_DIGEST_REFRESH_INTERVAL = float(os.getenv('WEATHER_DIGEST_REFRESH_INTERVAL', 300))
+WEATHER_HOT_CITIES = int(os.getenv('WEATHER_HOT_CITIES', 25))
+WEATHER_POPULARITY_DECAY = float(os.getenv('WEATHER_POPULARITY_DECAY', 0.5))
+# Multi-city /weather (cities fetched concurrently, compared in one digest)
+WEATHER_MAX_CITIES = int(os.getenv('WEATHER_MAX_CITIES', 5))
+WEATHER_FETCH_CONCURRENCY = int(os.getenv('WEATHER_FETCH_CONCURRENCY', 4))
+
+# Conversation store settings
+CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', 3600))
+CONVERSATION_MAX_CHARS = int(os.getenv('CONVERSATION_MAX_CHARS', 50_000_000))
+CONVERSATION_EXPIRY_INTERVAL = float(os.getenv('CONVERSATION_EXPIRY_INTERVAL', 30))
+CONVERSATION_EXPIRY_BATCH = int(os.getenv('CONVERSATION_EXPIRY_BATCH', 1000))
+# Durable conversations (SQLite file written behind in batches; empty path keeps them in memory only)
+CONVERSATION_DB_PATH = os.getenv('CONVERSATION_DB_PATH', '')
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv('CONVERSATION_FLUSH_INTERVAL', 1.0))
+CONVERSATION_FLUSH_BATCH = int(os.getenv('CONVERSATION_FLUSH_BATCH', 500))
+CONVERSATION_COMPACT_INTERVAL = float(os.getenv('CONVERSATION_COMPACT_INTERVAL', 3600))
+CONVERSATION_FLUSH_TIMEOUT = float(os.getenv('CONVERSATION_FLUSH_TIMEOUT', 5.0))
+
+# Long-term memory (past exchanges indexed as hashed TF-IDF vectors; the top matches are added to prompts)
+MEMORY_ENABLED = os.getenv('MEMORY_ENABLED', 'true').lower() == 'true'
+MEMORY_DIM = int(os.getenv('MEMORY_DIM', 256))
+MEMORY_TOP_K = int(os.getenv('MEMORY_TOP_K', 3))
+MEMORY_MIN_SCORE = float(os.getenv('MEMORY_MIN_SCORE', 0.1))
+MEMORY_MAX_EXCHANGES = int(os.getenv('MEMORY_MAX_EXCHANGES', 200))
+MEMORY_MAX_ROWS = int(os.getenv('MEMORY_MAX_ROWS', 100_000))
+MEMORY_TTL = float(os.getenv('MEMORY_TTL', 30 * 24 * 3600))
+MEMORY_SNIPPET_CHARS = int(os.getenv('MEMORY_SNIPPET_CHARS', 300))
+
+# Reply routing index (bot-authored message ids that accept reply-to-continue)
+REPLY_INDEX_SIZE = int(os.getenv('REPLY_INDEX_SIZE', 50_000))
+REPLY_INDEX_TTL = float(os.getenv('REPLY_INDEX_TTL', 6 * 3600))
+
+# Response cache settings (opt-in per cog; set RESPONSE_CACHE_DIR to persist across restarts)
+MATH_RESPONSE_CACHE = os.getenv('MATH_RESPONSE_CACHE', 'false').lower() == 'true'
+PROGRAM_RESPONSE_CACHE = os.getenv('PROGRAM_RESPONSE_CACHE', 'false').lower() == 'true'
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 24 * 3600))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 2048))
+RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR')
+
+# Admission control (per-user / per-guild token buckets and per-provider fair queues)
+ADMISSION_USER_RATE = float(os.getenv('ADMISSION_USER_RATE', 0.2))
+ADMISSION_USER_BURST = float(os.getenv('ADMISSION_USER_BURST', 5))
+ADMISSION_GUILD_RATE = float(os.getenv('ADMISSION_GUILD_RATE', 2))
+ADMISSION_GUILD_BURST = float(os.getenv('ADMISSION_GUILD_BURST', 30))
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', 50))
+ADMISSION_MAX_BUCKETS = int(os.getenv('ADMISSION_MAX_BUCKETS', 100_000))
+
+# Provider routing (ordered fallback per command, circuit breakers and hedged requests)
+CHAT_PROVIDERS = os.getenv('CHAT_PROVIDERS', 'groq,together,sambanova').split(',')
+MATH_PROVIDERS = os.getenv('MATH_PROVIDERS', 'together,sambanova,groq').split(',')
+PROGRAM_PROVIDERS = os.getenv('PROGRAM_PROVIDERS', 'sambanova,together,groq').split(',')
+HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', 'true').lower() == 'true'
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 0.5))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+
+# Context assembly (input token budgets per command and rolling summary size)
+CHAT_CONTEXT_BUDGET = int(os.getenv('CHAT_CONTEXT_BUDGET', 3000))
+MATH_CONTEXT_BUDGET = int(os.getenv('MATH_CONTEXT_BUDGET', 2500))
+PROGRAM_CONTEXT_BUDGET = int(os.getenv('PROGRAM_CONTEXT_BUDGET', 4000))
+SUMMARY_MAX_CHARS = int(os.getenv('SUMMARY_MAX_CHARS', 800))
+SUMMARY_TURN_CHARS = int(os.getenv('SUMMARY_TURN_CHARS', 160))
+
+# Metrics (Prometheus text endpoint on localhost; 0 disables it)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Sharding (SHARDED uses AutoShardedBot; SHARD_PROCESSES > 1 needs an explicit SHARD_COUNT)
+SHARDED = os.getenv('SHARDED', 'false').lower() == 'true'
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 0)) or None
+SHARD_IDS = os.getenv('SHARD_IDS')
+SHARD_PROCESSES = int(os.getenv('SHARD_PROCESSES', 1))
+SHARD_RESTART_DELAY = float(os.getenv('SHARD_RESTART_DELAY', 5))
+
+# Cross-process state ('memory' keeps everything in-process, 'sqlite' shares it through STATE_PATH)
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+STATE_PATH = os.getenv('STATE_PATH', 'lacri_state.db')
+
+# Startup (cog module names to skip, e.g. "weather,program"; threads used to import cogs)
+DISABLED_COGS = [name.strip() for name in os.getenv('DISABLED_COGS', '').split(',') if name.strip()]
+EXTENSION_IMPORT_WORKERS = int(os.getenv('EXTENSION_IMPORT_WORKERS', 4))
+
+# Outbound messages (per-channel pacing of sends/edits; longer answers go out as a file)
+OUTBOUND_CHANNEL_RATE = float(os.getenv('OUTBOUND_CHANNEL_RATE', 1.0))
+OUTBOUND_CHANNEL_BURST = float(os.getenv('OUTBOUND_CHANNEL_BURST', 5))
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', 45))
+OUTBOUND_MAX_CHANNELS = int(os.getenv('OUTBOUND_MAX_CHANNELS', 10_000))
+OUTBOUND_MAX_MESSAGES = int(os.getenv('OUTBOUND_MAX_MESSAGES', 4))
+
+# Local math (arithmetic, conversions, simple equations and stats answered without the LLM)
+MATH_LOCAL_ENABLED = os.getenv('MATH_LOCAL_ENABLED', 'true').lower() == 'true'
+MATH_LOCAL_TIMEOUT = float(os.getenv('MATH_LOCAL_TIMEOUT', 2.0))
+MATH_LOCAL_WORKERS = int(os.getenv('MATH_LOCAL_WORKERS', 1))
+
+# Event-loop monitoring (lag sampling, stack snapshots of blocking callbacks, on-demand profiles)
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', 0.1))
+LOOP_BLOCK_THRESHOLD = float(os.getenv('LOOP_BLOCK_THRESHOLD', 0.5))
+LOOP_LAG_WINDOW = int(os.getenv('LOOP_LAG_WINDOW', 3000))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 300))
+
+# Command deadlines (seconds a command may spend on provider calls; slash commands also stop
+# before their 15-minute interaction token runs out, keeping a margin for the final edit)
+CHAT_DEADLINE = float(os.getenv('CHAT_DEADLINE', 90))
+MATH_DEADLINE = float(os.getenv('MATH_DEADLINE', 120))
+PROGRAM_DEADLINE = float(os.getenv('PROGRAM_DEADLINE', 120))
+COMMAND_DEADLINES = {'chat': CHAT_DEADLINE, 'math': MATH_DEADLINE, 'program': PROGRAM_DEADLINE}
+INTERACTION_LIFETIME = float(os.getenv('INTERACTION_LIFETIME', 15 * 60 - 10))
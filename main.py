@@ -1,21 +1,196 @@
+import asyncio
 import nextcord
 from nextcord.ext import commands
-import os
-from config import DISCORD_TOKEN
+import time
+from config import (
+    CONVERSATION_DB_PATH,
+    DISCORD_TOKEN,
+    MEMORY_ENABLED,
+    METRICS_HOST,
+    METRICS_PORT,
+    SHARDED,
+    SHARD_COUNT,
+    SHARD_IDS,
+    SHARD_PROCESSES,
+    STATE_BACKEND,
+)
+from utils.http_client import HTTPClient
+from utils.providers import ProviderRegistry
+from utils.router import ProviderRouter
+from utils.conversation import ConversationStore
+from utils.conversation_db import ConversationDB
+from utils.memory import MemoryIndex
+from utils.reply_index import ReplyIndex
+from utils.admission import AdmissionController
+from utils.outbound import OutboundPipeline
+from utils.deadline import CommandDeadlines
+from utils.weather_api import weather_cache
+from utils.weather_digest import WeatherDigestEngine
+from utils.loop_monitor import LoopMonitor, SamplingProfiler
+from utils.metrics import registry, MetricsServer, command_started, command_finished
+from utils.state import create_state_backend
+from utils.sharding import launch, parse_shard_ids
+from utils.extensions import discover_extensions, load_extensions, format_timings
 
-class LacriAI(commands.Bot):
-    def __init__(self):
+class LacriBase:
+    """Setup and hooks shared by the single-connection bot and the sharded bot."""
+
+    def __init__(self, metrics_port: int = METRICS_PORT, **options):
         intents = nextcord.Intents.default()
         intents.message_content = True
-        super().__init__(command_prefix="!", intents=intents)
+        super().__init__(command_prefix="!", intents=intents, **options)
+        self.state = create_state_backend()
+        self.http_client = HTTPClient()
+        self.llm = ProviderRegistry(self.http_client)
+        self.router = ProviderRouter(self.llm)
+        self.admission = AdmissionController(self.router, state=self.state)
+        self.conversations = ConversationStore(
+            state=self.state,
+            db=ConversationDB() if CONVERSATION_DB_PATH else None,
+            memory=MemoryIndex() if MEMORY_ENABLED else None
+        )
+        self.reply_index = ReplyIndex(state=self.state)
+        self.outbound = OutboundPipeline()
+        self.deadlines = CommandDeadlines()
+        self.weather_digests = WeatherDigestEngine(self.router, self.http_client)
+        self.response_caches = {}
+        self.loop_monitor = LoopMonitor()
+        self.profiler = SamplingProfiler()
+        self.metrics_server = MetricsServer(registry, METRICS_HOST, metrics_port) if metrics_port else None
+        self.register_metrics()
+
+        self.before_invoke(self.before_command)
+        self.after_invoke(self.after_command)
+        self.application_command_before_invoke(self.before_application_command)
+        self.application_command_after_invoke(self.after_application_command)
+
+        start = time.perf_counter()
+        self.extension_timings = load_extensions(self, discover_extensions())
+        print(format_timings(self.extension_timings, time.perf_counter() - start))
+
+    async def start(self, *args, **kwargs):
+        await self.http_client.open()
+        await asyncio.gather(*(cache.load() for cache in self.response_caches.values()))
+        if self.state is not None:
+            self.state.start()
+        self.loop_monitor.start()
+        self.conversations.start()
+        self.weather_digests.start()
+        local_math = getattr(self.get_cog('MathCog'), 'local_math', None)
+        if local_math is not None:
+            local_math.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        if self.profiler.running:
+            self.profiler.stop()
+        await self.conversations.stop()
+        await self.weather_digests.stop()
+        for cache in self.response_caches.values():
+            cache.save()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await self.http_client.close()
+        await self.loop_monitor.stop()
+        if self.state is not None:
+            await self.state.close()
+        await super().close()
+
+    async def before_command(self, ctx):
+        command_started(ctx.command.qualified_name)
+
+    async def after_command(self, ctx):
+        command_finished(ctx.command.qualified_name, 'prefix', ctx.message.created_at)
+
+    async def before_application_command(self, interaction):
+        command_started(interaction.application_command.qualified_name)
+
+    async def after_application_command(self, interaction):
+        command_finished(interaction.application_command.qualified_name, 'slash', interaction.created_at)
+
+    def cache_stats(self) -> dict:
+        stats = {'weather': weather_cache.stats(), 'weather_digest': self.weather_digests.digests.stats()}
+        for name, cache in self.response_caches.items():
+            stats[name] = cache.stats()
+        return stats
+
+    def shard_health(self) -> dict:
+        """Gateway latency, connection state and guild count for each shard this process runs."""
+        guilds = {}
+        for guild in self.guilds:
+            guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+        shards = getattr(self, 'shards', None)
+        if shards is None:
+            shard_id = self.shard_id or 0
+            return {shard_id: {'latency': self.latency, 'up': self.is_ready() and not self.is_closed(),
+                               'guilds': len(self.guilds)}}
+        return {
+            shard_id: {'latency': shard.latency, 'up': not shard.is_closed(), 'guilds': guilds.get(shard_id, 0)}
+            for shard_id, shard in shards.items()
+        }
 
-        for filename in os.listdir('./cogs'):
-            if filename.endswith('.py') and not filename.startswith('__'):
-                try:
-                    self.load_extension(f'cogs.{filename[:-3]}')
-                    print(f'Loaded {filename[:-3]} cog')
-                except Exception as e:
-                    print(f'Failed to load {filename[:-3]} cog: {str(e)}')
+    def local_math_stats(self):
+        """LocalMath counters from the math cog, or None when it isn't loaded or local answers are off."""
+        local_math = getattr(self.get_cog('MathCog'), 'local_math', None)
+        return local_math.stats() if local_math is not None else None
+
+    def register_metrics(self):
+        def hit_ratios():
+            for name, stats in self.cache_stats().items():
+                lookups = stats['hits'] + stats['misses'] + stats.get('coalesced', 0)
+                yield (name,), (stats['hits'] + stats.get('coalesced', 0)) / lookups if lookups else 0.0
+
+        registry.callback('lacri_cache_hit_ratio', 'Share of cache lookups served without an upstream call', ('cache',), hit_ratios)
+        registry.callback('lacri_cache_entries', 'Entries held per cache', ('cache',),
+                          lambda: (((name,), stats['size']) for name, stats in self.cache_stats().items()))
+        registry.callback('lacri_conversation_turns', 'Turns held by the conversation store', (),
+                          lambda: [((), self.conversations.total_turns)])
+        registry.callback('lacri_conversation_histories', 'Histories held by the conversation store', (),
+                          lambda: [((), self.conversations.stats()['histories'])])
+        registry.callback('lacri_conversation_chars', 'Characters held by the conversation store', (),
+                          lambda: [((), self.conversations.stats()['chars'])])
+        registry.callback('lacri_conversation_evictions', 'Turns and histories removed from the conversation store',
+                          ('reason',), lambda: (
+                              ((reason,), self.conversations.stats()[field]) for reason, field in
+                              (('overflow', 'overflow_evictions'), ('expired', 'expired_turns'), ('cap', 'cap_evictions'))
+                          ))
+        if self.conversations.db is not None:
+            registry.callback('lacri_conversation_pending_writes', 'Conversation snapshots waiting to be written to disk', (),
+                              lambda: [((), self.conversations.db.pending)])
+        registry.callback('lacri_weather_hot_cities', 'Cities whose weather digest is refreshed in the background', (),
+                          lambda: [((), self.weather_digests.stats()['hot_cities'])])
+        registry.callback('lacri_weather_digest_refreshes', 'Background weather digest refreshes', ('outcome',),
+                          lambda: (((outcome,), self.weather_digests.stats()[field])
+                                   for outcome, field in (('ok', 'refreshed'), ('error', 'refresh_errors'))))
+        registry.callback('lacri_local_math_answers', 'Math prompts answered without the LLM', ('outcome',),
+                          lambda: (((outcome,), count) for outcome, count in (self.local_math_stats() or {}).items()))
+        if self.conversations.memory is not None:
+            registry.callback('lacri_memory_exchanges', 'Past exchanges indexed for recall', (),
+                              lambda: [((), self.conversations.memory.stats()['exchanges'])])
+            registry.callback('lacri_memory_bytes', 'Bytes held by memory index vectors', (),
+                              lambda: [((), self.conversations.memory.stats()['bytes'])])
+            registry.callback('lacri_memory_searches', 'Recall searches, and those that found something', ('result',),
+                              lambda: (((result,), self.conversations.memory.stats()[field])
+                                       for result, field in (('all', 'searches'), ('hit', 'hits'))))
+        registry.callback('lacri_admission_queue_depth', 'Requests waiting for a provider slot', ('provider',),
+                          lambda: (((name,), queue.depth) for name, queue in self.admission.queues.items()))
+        registry.callback('lacri_admission_rejected', 'Requests rejected by admission control', ('reason',),
+                          lambda: (((reason,), count) for reason, count in self.admission.rejected.items()))
+        registry.callback('lacri_circuit_open', 'Whether a provider circuit breaker is open', ('provider',),
+                          lambda: (((name,), int(breaker.state == 'open')) for name, breaker in self.router.breakers.items()))
+        registry.callback('lacri_shard_latency_seconds', 'Gateway heartbeat latency per shard', ('shard',),
+                          lambda: (((str(shard_id),), health['latency']) for shard_id, health in self.shard_health().items()))
+        registry.callback('lacri_shard_up', 'Whether the shard gateway connection is up', ('shard',),
+                          lambda: (((str(shard_id),), int(health['up'])) for shard_id, health in self.shard_health().items()))
+        registry.callback('lacri_shard_guilds', 'Guilds served per shard', ('shard',),
+                          lambda: (((str(shard_id),), health['guilds']) for shard_id, health in self.shard_health().items()))
+
+    async def on_raw_message_delete(self, payload):
+        """Stop work for a command whose triggering message was deleted."""
+        if self.deadlines.cancel_message(payload.message_id):
+            print(f"Cancelled command for deleted message {payload.message_id}")
 
     async def on_ready(self):
         print(f"tonight's the night... bot is ready as {self.user}")
@@ -26,9 +201,47 @@ class LacriAI(commands.Bot):
             )
         )
 
-def main():
-    bot = LacriAI()
+class LacriAI(LacriBase, commands.Bot):
+    """Single gateway connection; the default deployment."""
+
+class ShardedLacriAI(LacriBase, commands.AutoShardedBot):
+    """Runs several shards over one event loop; `shard_ids` limits it to a range."""
+
+    async def on_shard_ready(self, shard_id: int):
+        print(f"Shard {shard_id} ready")
+
+    async def on_shard_disconnect(self, shard_id: int):
+        print(f"Shard {shard_id} disconnected")
+
+    async def on_shard_resumed(self, shard_id: int):
+        print(f"Shard {shard_id} resumed")
+
+def run_shards(shard_ids: list, shard_count: int, worker_index: int = 0):
+    """Entry point for one launcher worker; each worker serves metrics on its own port."""
+    bot = ShardedLacriAI(
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        metrics_port=METRICS_PORT + worker_index if METRICS_PORT else 0
+    )
     bot.run(DISCORD_TOKEN)
 
+def main():
+    if SHARD_PROCESSES > 1:
+        if not SHARD_COUNT:
+            print("SHARD_PROCESSES needs SHARD_COUNT to split shards between workers")
+            return
+        if STATE_BACKEND == 'memory':
+            print("Warning: STATE_BACKEND is memory, so each worker keeps its own conversations and rate limits")
+        launch(run_shards, SHARD_COUNT, SHARD_PROCESSES)
+    elif SHARDED or SHARD_COUNT or SHARD_IDS:
+        bot = ShardedLacriAI(
+            shard_ids=parse_shard_ids(SHARD_IDS) if SHARD_IDS else None,
+            shard_count=SHARD_COUNT
+        )
+        bot.run(DISCORD_TOKEN)
+    else:
+        bot = LacriAI()
+        bot.run(DISCORD_TOKEN)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,241 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from config import (
+    ADMISSION_USER_RATE,
+    ADMISSION_USER_BURST,
+    ADMISSION_GUILD_RATE,
+    ADMISSION_GUILD_BURST,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_MAX_BUCKETS,
+)
+from utils.state import SQLiteBackend
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away; the message is safe to show to the user."""
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def retry_after(self) -> float:
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate else math.inf
+
+class BucketMap:
+    """LRU-bounded map of token buckets, one per user or guild."""
+
+    def __init__(self, rate: float, capacity: float, maxsize: int = ADMISSION_MAX_BUCKETS):
+        self.rate = rate
+        self.capacity = capacity
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+
+    def get(self, key) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        bucket.refill()
+        return bucket
+
+    def put(self, key, bucket: TokenBucket):
+        """Local buckets are updated in place; kept for parity with SharedBucketMap."""
+
+class SharedBucketMap(BucketMap):
+    """BucketMap that also keeps bucket levels in a shared state backend.
+
+    Admission is decided from the local buckets alone. Each lookup schedules
+    a read of the shared level on a worker thread, which lowers the local
+    bucket if another process has spent more, and every spend is queued on
+    the backend's write-behind flush. A user's next request after spending in
+    another process can therefore still see the old level, and two processes
+    admitting the same user at the same instant can both spend the last
+    token; for rate limiting that slack is acceptable.
+    """
+
+    def __init__(self, state: SQLiteBackend, namespace: str, rate: float, capacity: float,
+                 maxsize: int = ADMISSION_MAX_BUCKETS):
+        super().__init__(rate, capacity, maxsize)
+        self.state = state
+        self.namespace = namespace
+        self._syncing = set()
+        self._tasks = set()
+
+    def get(self, key) -> TokenBucket:
+        bucket = super().get(key)
+        if key not in self._syncing:
+            self._syncing.add(key)
+            task = asyncio.get_running_loop().create_task(self._sync(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return bucket
+
+    def put(self, key, bucket: TokenBucket):
+        ttl = (self.capacity - bucket.tokens) / self.rate if self.rate else 3600
+        self.state.put(self.namespace, key, [bucket.tokens, time.time()], max(ttl, 1.0))
+
+    async def _sync(self, key):
+        try:
+            saved = await self.state.fetch(self.namespace, key)
+        except Exception as e:
+            print(f"Error reading shared bucket: {str(e)}")
+            return
+        finally:
+            self._syncing.discard(key)
+        bucket = self._buckets.get(key)
+        if saved is None or bucket is None:
+            return
+        shared = min(self.capacity, saved[0] + max(0.0, time.time() - saved[1]) * self.rate)
+        bucket.refill()
+        bucket.tokens = min(bucket.tokens, shared)
+
+class FairQueue:
+    """Bounded per-provider wait queue that hands out slots round-robin across guilds."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int = ADMISSION_QUEUE_SIZE):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.depth = 0
+        self._waiting = OrderedDict()
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def full(self) -> bool:
+        return self.depth >= self.max_queue
+
+    async def acquire(self, guild_key):
+        start = time.monotonic()
+        if self.active < self.concurrency and not self.depth:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(guild_key, deque()).append(future)
+            self.depth += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release()
+                else:
+                    self._discard(guild_key, future)
+                raise
+        self._record_wait(time.monotonic() - start)
+
+    def release(self):
+        self.active -= 1
+        while self.active < self.concurrency and self._waiting:
+            guild_key, waiters = next(iter(self._waiting.items()))
+            future = waiters.popleft()
+            self.depth -= 1
+            if waiters:
+                self._waiting.move_to_end(guild_key)
+            else:
+                del self._waiting[guild_key]
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, guild_key):
+        await self.acquire(guild_key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _discard(self, guild_key, future):
+        waiters = self._waiting.get(guild_key)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self.depth -= 1
+            if not waiters:
+                del self._waiting[guild_key]
+
+    def _record_wait(self, waited: float):
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> dict:
+        return {
+            'active': self.active,
+            'depth': self.depth,
+            'admitted': self.admitted,
+            'avg_wait': self.total_wait / self.admitted if self.admitted else 0.0,
+            'max_wait': self.max_wait
+        }
+
+class AdmissionController:
+    """Gatekeeper in front of every LLM-backed command.
+
+    `admit()` checks the user and guild token buckets and the queue bound
+    of the command's primary provider synchronously, so overload is rejected before the
+    interaction is deferred, then returns the slot to wait on. User buckets
+    are also synced through the shared state backend when there is one, since a
+    user's guilds may sit on different shard processes; a guild belongs to exactly one
+    shard, so guild buckets always stay local.
+    """
+
+    def __init__(self, router, state: SQLiteBackend = None):
+        self.router = router
+        if state is not None:
+            self.users = SharedBucketMap(state, 'user-bucket', ADMISSION_USER_RATE, ADMISSION_USER_BURST)
+        else:
+            self.users = BucketMap(ADMISSION_USER_RATE, ADMISSION_USER_BURST)
+        self.guilds = BucketMap(ADMISSION_GUILD_RATE, ADMISSION_GUILD_BURST)
+        self.queues = {
+            name: FairQueue(name, router.registry.max_concurrency(name))
+            for name in router.registry.names
+        }
+        self.rejected = {'user': 0, 'guild': 0, 'queue': 0}
+
+    def admit(self, command: str, user_id: int, guild_id: int = None):
+        queue = self.queues[self.router.primary(command)]
+        user_bucket = self.users.get(user_id)
+        guild_bucket = self.guilds.get(guild_id) if guild_id is not None else None
+
+        if user_bucket.tokens < 1:
+            self.rejected['user'] += 1
+            raise AdmissionRejected(
+                f"easy there... you're moving faster than i can think. try again in {math.ceil(user_bucket.retry_after())}s."
+            )
+        if guild_bucket is not None and guild_bucket.tokens < 1:
+            self.rejected['guild'] += 1
+            raise AdmissionRejected(
+                f"this server is keeping me very busy right now. try again in {math.ceil(guild_bucket.retry_after())}s."
+            )
+        if queue.full():
+            self.rejected['queue'] += 1
+            raise AdmissionRejected("i'm juggling too many requests right now... give me a moment and try again.")
+
+        user_bucket.tokens -= 1
+        self.users.put(user_id, user_bucket)
+        if guild_bucket is not None:
+            guild_bucket.tokens -= 1
+        return queue.slot(guild_id if guild_id is not None else f"user:{user_id}")
+
+    def stats(self) -> dict:
+        return {
+            'queues': {name: queue.stats() for name, queue in self.queues.items()},
+            'rejected': dict(self.rejected)
+        }
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+class AsyncTTLCache:
+    """LRU-bounded TTL cache that coalesces concurrent lookups of the same key.
+
+    `None` results are cached as negative entries with their own TTL, and
+    only one fetch per key is ever in flight; every other caller awaits it.
+    """
+
+    def __init__(self, ttl: float, maxsize: int, negative_ttl: float = None, clock=time.monotonic):
+        self.clock = clock
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return (found, value) for a fresh entry, dropping it if expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key, value, ttl: float = None):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        self.restore(key, value, self.clock() + ttl)
+
+    def restore(self, key, value, expires_at: float):
+        """Insert an entry with an absolute expiry time (e.g. one loaded from disk)."""
+        if expires_at <= self.clock():
+            return
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def entries(self):
+        """Yield (key, value, expires_at) for every live entry, least recently used first."""
+        now = self.clock()
+        for key, (expires_at, value) in list(self._data.items()):
+            if expires_at > now:
+                yield key, value, expires_at
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_fetch(self, key, fetch):
+        """Return the cached value for key, or run `fetch()` once for all concurrent callers."""
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fill(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _fill(self, key, fetch):
+        value = await fetch()
+        self.set(key, value)
+        return value
+
+    def _release(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'in_flight': len(self._inflight)
+        }
@@ -0,0 +1,201 @@
+import re
+from functools import lru_cache
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+# Languages a fence can be tagged with, in tie-break order
+LANGUAGES = (
+    'python', 'javascript', 'typescript', 'java', 'cpp', 'csharp', 'rust', 'go',
+    'sql', 'bash', 'html', 'css', 'php', 'ruby', 'kotlin',
+)
+
+_HINTS = {
+    'python': re.compile(r'^\s*(def \w+\(|class \w+.*:$|import \w|from [\w.]+ import |elif |if __name__)|\bself\.|print\('),
+    'javascript': re.compile(r'\b(const|let|var) \w+ =|=>|console\.log|\bfunction\b|require\(|document\.'),
+    'typescript': re.compile(r'\binterface \w+ \{|:\s*(string|number|boolean)\b'),
+    'java': re.compile(r'\bpublic (static |final )*(class|void|int|String)\b|System\.out\.'),
+    'cpp': re.compile(r'#include\s*<|\bstd::|cout\s*<<'),
+    'csharp': re.compile(r'\busing System\b|Console\.Write'),
+    'rust': re.compile(r'\bfn \w+\(|\blet mut\b|println!\(|\bimpl\b'),
+    'go': re.compile(r'^package \w+|\bfunc \w+\(|fmt\.Print|:= '),
+    'sql': re.compile(r'^\s*(SELECT|INSERT INTO|UPDATE|DELETE FROM|CREATE TABLE)\b', re.IGNORECASE),
+    'bash': re.compile(r'^#!/bin/(ba)?sh|^\s*(echo|sudo|apt|pip|npm|cd|export|chmod) '),
+    'html': re.compile(r'^\s*</?(!DOCTYPE|html|div|p|span|body|head|script|a|ul|li)\b', re.IGNORECASE),
+    'css': re.compile(r'^\s*[.#]?[\w-]+\s*\{\s*$|^\s*[\w-]+:\s*[^;]+;\s*$'),
+    'php': re.compile(r'<\?php|\$\w+\s*='),
+    'ruby': re.compile(r'^\s*(puts |require \'|end$)|\bdo \|'),
+    'kotlin': re.compile(r'\bfun \w+\(|\bval \w+ ='),
+}
+
+_CODE_LINE = re.compile(
+    r'^\s*(def |class \w|import \w|from [\w.]+ import |return\b|#include|#!|//|/\*|'
+    r'(public|private|protected|static) |function |const |let |var |fn |func |package |'
+    r'(if|for|while|elif|else|try|except|with)\b.*:$|[{}\])]+;?$|<\w+[^>]*>)'
+    r'|^\s*[\w.\[\]]+\s*[+\-*/]?=\s*\S|^\s*[\w.]+\(.*\)\s*;?$|[;{]\s*$'
+)
+_LIST_ITEM = re.compile(r'^\s*([-*+] |\d+[.)] )')
+
+@lru_cache(maxsize=None)
+def _lexers() -> dict:
+    lexers = {}
+    for name in LANGUAGES:
+        try:
+            lexers[name] = get_lexer_by_name(name)
+        except ClassNotFound:
+            pass
+    return lexers
+
+def detect_language(sample: str) -> str:
+    """Best-guess fence tag for a code sample, or '' when nothing stands out.
+
+    Keyword hints are counted per line and Pygments' own `analyse_text`
+    scores for a short list of common languages are added on top; a full
+    `guess_lexer` over every lexer is both slow and unreliable on snippets.
+    """
+    lines = sample.splitlines()
+    scores = {
+        name: sum(1 for line in lines if hint.search(line)) for name, hint in _HINTS.items()
+    }
+    for name, lexer in _lexers().items():
+        scores[name] = scores.get(name, 0) + 2 * lexer.analyse_text(sample)
+    best = max(LANGUAGES, key=lambda name: scores.get(name, 0))
+    return best if scores.get(best, 0) > 0 else ''
+
+def looks_like_code(line: str) -> bool:
+    if _LIST_ITEM.match(line):
+        return False
+    return bool(line[:1] == '\t' or line[:4] == '    ' or _CODE_LINE.search(line))
+
+class CodeFormatter:
+    """Incremental formatter that fences bare code and tags untagged fences.
+
+    `feed()` takes raw text as it arrives and returns the formatted text that
+    is now settled; `flush()` returns the rest and closes any open block.
+    Only the current partial line and, for a block whose language is not yet
+    known, its first few lines are held back, so each byte is looked at a
+    bounded number of times however the text is chunked.
+
+    Fences written by the model pass through; one opened without a language
+    gets a detected tag. Until the model writes a fence of its own, runs of
+    code-looking lines are wrapped in a fence. A prose line that has grown
+    past `eager_chars` without looking like code is passed through before
+    its newline arrives, so long paragraphs still stream.
+    """
+
+    def __init__(self, sample_lines: int = 6, sample_chars: int = 600, eager_chars: int = 120):
+        self.sample_lines = sample_lines
+        self.sample_chars = sample_chars
+        self.eager_chars = eager_chars
+        self.fence = None
+        self.saw_fence = False
+        self._partial = []
+        self._partial_chars = 0
+        self._eager = False
+        self._checked = False
+        self._sample = None
+        self._sample_chars = 0
+        self._indent = ''
+        self._blank = []
+
+    def feed(self, chunk: str) -> str:
+        out = ''
+        if self._eager:
+            if '\n' not in chunk:
+                return chunk
+            head, chunk = chunk.split('\n', 1)
+            out = head + '\n'
+            self._eager = False
+        self._partial.append(chunk)
+        self._partial_chars += len(chunk)
+        if '\n' in chunk:
+            lines = ''.join(self._partial).split('\n')
+            tail = lines.pop()
+            self._partial = [tail] if tail else []
+            self._partial_chars = len(tail)
+            self._checked = False
+            out += ''.join(self._line(line) for line in lines)
+        if self._partial_chars >= self.eager_chars and not self._checked and self.fence is None:
+            self._checked = True
+            partial = ''.join(self._partial)
+            if not partial.lstrip().startswith('```') and not looks_like_code(partial):
+                self._partial = []
+                self._partial_chars = 0
+                self._eager = True
+                out += partial
+        return out
+
+    def flush(self) -> str:
+        partial = ''.join(self._partial)
+        self._partial = []
+        self._partial_chars = 0
+        self._eager = False
+        out = self._line(partial) if partial else ''
+        if self.fence is not None:
+            out += self._release() + ('```\n' if self.fence == 'auto' else f"{self._indent}```\n")
+            self._blank = []
+            self.fence = None
+        return out[:-1] if out.endswith('\n') else out
+
+    def _line(self, line: str) -> str:
+        stripped = line.strip()
+        if self.fence == 'model':
+            if stripped == '```':
+                self.fence = None
+                return self._release() + line + '\n'
+            return self._code(line)
+
+        if self.fence == 'auto':
+            if not stripped:
+                self._blank.append(line)
+                return ''
+            if stripped.startswith('```') or not looks_like_code(line):
+                out = self._release() + '```\n' + ''.join(blank + '\n' for blank in self._blank)
+                self._blank = []
+                self.fence = None
+                return out + self._line(line)
+            held = ''.join(blank + '\n' for blank in self._blank)
+            self._blank = []
+            return self._code_block(held) + self._code(line)
+
+        if stripped.startswith('```'):
+            self.saw_fence = True
+            self.fence = 'model'
+            self._indent = line[:len(line) - len(line.lstrip())]
+            if stripped[3:].strip():
+                return line + '\n'
+            self._sample = []
+            self._sample_chars = 0
+            return ''
+        if not self.saw_fence and stripped and looks_like_code(line):
+            self.fence = 'auto'
+            self._indent = ''
+            self._sample = []
+            self._sample_chars = 0
+            return self._code(line)
+        return line + '\n'
+
+    def _code(self, line: str) -> str:
+        if self._sample is None:
+            return line + '\n'
+        self._sample.append(line)
+        self._sample_chars += len(line)
+        if len(self._sample) >= self.sample_lines or self._sample_chars >= self.sample_chars:
+            return self._release()
+        return ''
+
+    def _code_block(self, text: str) -> str:
+        """Pass held blank lines into the current block, keeping them in the sample if it is still open."""
+        if not text:
+            return ''
+        if self._sample is not None:
+            self._sample.extend(text.split('\n')[:-1])
+            return ''
+        return text
+
+    def _release(self) -> str:
+        """Emit the opening fence and the lines held back while its language was unknown."""
+        if self._sample is None:
+            return ''
+        sample, self._sample = self._sample, None
+        language = detect_language('\n'.join(sample))
+        return f"{self._indent}```{language}\n" + ''.join(line + '\n' for line in sample)
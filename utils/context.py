@@ -0,0 +1,88 @@
+import re
+from config import SUMMARY_MAX_CHARS, SUMMARY_TURN_CHARS
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s|\n")
+MESSAGE_OVERHEAD = 4
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate: words and punctuation marks, close to BPE counts for English."""
+    return len(_TOKEN_RE.findall(text))
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+def compact_prompt(prompt: str) -> str:
+    """Strip indentation and blank lines from a triple-quoted system prompt."""
+    return '\n'.join(line.strip() for line in prompt.splitlines() if line.strip())
+
+def summarize_turn(role: str, content: str, limit: int = SUMMARY_TURN_CHARS) -> str:
+    """One-line gist of a turn: its first sentence, clipped to `limit` characters."""
+    text = content.strip()
+    if text.startswith('```'):
+        text = "(shared some code)"
+    first = _SENTENCE_END.split(text, 1)[0].strip()
+    if len(first) > limit:
+        first = first[:limit - 3].rstrip() + "..."
+    speaker = "user" if role == "user" else "you"
+    return f"{speaker}: {first}"
+
+def roll_summary(summary: str, role: str, content: str, limit: int = SUMMARY_MAX_CHARS) -> str:
+    """Append a turn to a rolling summary, dropping the oldest lines past `limit`."""
+    lines = summary.split('\n') if summary else []
+    lines.append(summarize_turn(role, content))
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > limit:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+class ContextBuilder:
+    """Fits conversation history into an input token budget for one model.
+
+    The newest turns are kept verbatim; anything older that does not fit is
+    folded, together with the store's rolling summary, into one short
+    system note instead of being sent in full. Recalled memories from older
+    conversations go in last, best first, and only as far as the budget
+    still allows.
+    """
+
+    def __init__(self, system_prompt: str, budget: int):
+        self.system_prompt = compact_prompt(system_prompt)
+        self.budget = budget
+        self.system_tokens = count_tokens(self.system_prompt) + MESSAGE_OVERHEAD
+
+    def fit(self, turns: list, summary: str, user_message: str, memories: list = ()) -> list:
+        available = self.budget - self.system_tokens - count_tokens(user_message) - MESSAGE_OVERHEAD
+
+        kept = []
+        index = len(turns)
+        while index > 0:
+            message = turns[index - 1].as_message()
+            cost = message_tokens(message)
+            if cost > available:
+                break
+            kept.append(message)
+            available -= cost
+            index -= 1
+        kept.reverse()
+
+        for turn in turns[:index]:
+            summary = roll_summary(summary, turn.role, turn.content)
+        if summary:
+            note = {"role": "system", "content": f"earlier in this conversation:\n{summary}"}
+            while kept and message_tokens(note) > available:
+                dropped = kept.pop(0)
+                available += message_tokens(dropped)
+                summary = roll_summary(summary, dropped["role"], dropped["content"])
+                note = {"role": "system", "content": f"earlier in this conversation:\n{summary}"}
+            if message_tokens(note) <= available:
+                kept.insert(0, note)
+                available -= message_tokens(note)
+
+        memories = list(memories)
+        while memories:
+            note = {"role": "system", "content": "possibly relevant from earlier conversations:\n" + '\n'.join(memories)}
+            if message_tokens(note) <= available:
+                kept.insert(0, note)
+                break
+            memories.pop()
+        return kept
@@ -0,0 +1,306 @@
+import asyncio
+import heapq
+import os
+import time
+from collections import OrderedDict, deque
+from config import (
+    CONVERSATION_TTL,
+    CONVERSATION_MAX_CHARS,
+    CONVERSATION_EXPIRY_INTERVAL,
+    CONVERSATION_EXPIRY_BATCH,
+)
+from utils.context import roll_summary
+from utils.state import SQLiteBackend
+from utils.conversation_db import ConversationDB
+from utils.memory import MemoryIndex
+
+class Turn:
+    __slots__ = ('role', 'content', 'timestamp')
+
+    def __init__(self, role: str, content: str, timestamp: float):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+
+    def as_message(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+class ConversationStore:
+    """Bounded conversation history shared by every LLM cog.
+
+    Histories are keyed by (namespace, user_id) and held in fixed-capacity
+    ring buffers; turns pushed out of a full buffer are folded into a short
+    rolling summary rather than lost. A min-heap holds one expiry deadline
+    per history so the background task only touches histories that actually
+    have stale turns, and a global character cap evicts the least recently
+    active histories.
+
+    With a shared state backend, every change is queued on the backend's
+    write-behind flush, and `prepare()` picks up a newer copy written by
+    another shard process once per request, so a user keeps one conversation
+    across guilds served by different processes. Both run on worker threads.
+
+    With a `ConversationDB` every change is also queued for a batched write
+    to disk, and `prepare()` loads a history that isn't in memory from disk on
+    a worker thread, so conversations survive restarts and cog reloads.
+
+    With a `MemoryIndex` every exchange is also indexed for `recall`, which
+    finds relevant older exchanges long after they have left the history.
+    """
+
+    def __init__(self, ttl: float = CONVERSATION_TTL, max_chars: int = CONVERSATION_MAX_CHARS,
+                 expiry_interval: float = CONVERSATION_EXPIRY_INTERVAL,
+                 expiry_batch: int = CONVERSATION_EXPIRY_BATCH, state: SQLiteBackend = None,
+                 db: ConversationDB = None, memory: MemoryIndex = None):
+        self.ttl = ttl
+        self.state = state
+        self.db = db
+        self.memory = memory
+        self.max_chars = max_chars
+        self.expiry_interval = expiry_interval
+        self.expiry_batch = expiry_batch
+        self.capacities = {}
+        self._histories = OrderedDict()
+        self._deadlines = {}
+        self._summaries = {}
+        self._versions = {}
+        self._checked = set()
+        self._loading = {}
+        self._heap = []
+        self._task = None
+        self.total_turns = 0
+        self.total_chars = 0
+        self.overflow_evictions = 0
+        self.expired_turns = 0
+        self.cap_evictions = 0
+
+    def register(self, namespace: str, max_turns: int):
+        self.capacities[namespace] = max_turns
+
+    def append(self, namespace: str, user_id: int, role: str, content: str):
+        key = (namespace, user_id)
+        history = self._histories.get(key)
+        if history is None:
+            history = deque(maxlen=self.capacities.get(namespace, 10))
+            self._histories[key] = history
+        else:
+            self._histories.move_to_end(key)
+
+        if len(history) == history.maxlen:
+            oldest = history[0]
+            self._forget(oldest)
+            self._summaries[key] = roll_summary(self._summaries.get(key, ''), oldest.role, oldest.content)
+            self.overflow_evictions += 1
+        turn = Turn(role, content, time.monotonic())
+        history.append(turn)
+        self.total_turns += 1
+        self.total_chars += len(content)
+
+        if key not in self._deadlines:
+            self._schedule(key, turn.timestamp + self.ttl)
+        if self.memory is not None:
+            self.memory.add(namespace, user_id, role, content)
+        self._publish(key)
+        self._enforce_cap()
+
+    async def prepare(self, namespace: str, user_id: int):
+        """Bring a user's history up to date before a request reads or extends it.
+
+        Call once at the start of each request. It picks up a newer copy from
+        the shared backend and loads a persisted history that isn't in memory;
+        both reads run on a worker thread, and concurrent requests from one
+        user share the disk read.
+        """
+        key = (namespace, user_id)
+        if self.state is not None:
+            await self._refresh(key)
+        if self.db is None or key in self._histories or key in self._checked:
+            return
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.ensure_future(self._load(key))
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        await asyncio.shield(task)
+
+    def history(self, namespace: str, user_id: int, limit: int = None) -> list:
+        history = self._histories.get((namespace, user_id))
+        if not history:
+            return []
+        cutoff = time.monotonic() - self.ttl
+        turns = [turn for turn in history if turn.timestamp > cutoff]
+        return turns[-limit:] if limit else turns
+
+    def summary(self, namespace: str, user_id: int) -> str:
+        return self._summaries.get((namespace, user_id), '')
+
+    def recall(self, namespace: str, user_id: int, query: str) -> list:
+        """Prompt lines for past exchanges relevant to `query`, leaving out ones still in the history."""
+        if self.memory is None or not query:
+            return []
+        live = {turn.content for turn in self.history(namespace, user_id)}
+        return self.memory.notes(self.memory.search(namespace, user_id, query, exclude=live))
+
+    def clear(self, namespace: str = None):
+        """Drop local histories; shared and persisted copies are left to expire so they can be reloaded."""
+        for key in list(self._histories):
+            if namespace is None or key[0] == namespace:
+                self._drop(key)
+
+    def expire(self, budget: int = None) -> int:
+        """Expire stale turns for at most `budget` due histories; returns turns removed."""
+        budget = budget or self.expiry_batch
+        now = time.monotonic()
+        cutoff = now - self.ttl
+        removed = 0
+        while self._heap and budget > 0 and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) != deadline:
+                continue
+            del self._deadlines[key]
+            budget -= 1
+            history = self._histories[key]
+            while history and history[0].timestamp <= cutoff:
+                self._forget(history.popleft())
+                removed += 1
+            if history:
+                self._schedule(key, history[0].timestamp + self.ttl)
+            else:
+                del self._histories[key]
+                self._summaries.pop(key, None)
+                self._checked.discard(key)
+        self.expired_turns += removed
+        return removed
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._expiry_loop())
+        if self.db is not None:
+            self.db.start()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.db is not None:
+            await self.db.close()
+
+    async def _expiry_loop(self):
+        while True:
+            await asyncio.sleep(self.expiry_interval)
+            while self._heap and self._heap[0][0] <= time.monotonic():
+                self.expire()
+                await asyncio.sleep(0)
+
+    def _schedule(self, key, deadline: float):
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    def _forget(self, turn: Turn):
+        self.total_turns -= 1
+        self.total_chars -= len(turn.content)
+
+    def _drop(self, key):
+        for turn in self._histories.pop(key, ()):
+            self._forget(turn)
+        self._deadlines.pop(key, None)
+        self._summaries.pop(key, None)
+        self._versions.pop(key, None)
+        self._checked.discard(key)
+
+    def _snapshot(self, key):
+        """(summary, [[role, content, wall_time], ...]) of a history, for the shared backend and disk."""
+        offset = time.time() - time.monotonic()
+        turns = [[turn.role, turn.content, turn.timestamp + offset] for turn in self._histories[key]]
+        return self._summaries.get(key, ''), turns
+
+    def _publish(self, key):
+        if self.db is None and self.state is None:
+            return
+        summary, turns = self._snapshot(key)
+        if self.db is not None:
+            self.db.save(key[0], key[1], summary, turns, turns[-1][2] + self.ttl)
+        if self.state is not None:
+            version = f"{os.getpid()}-{time.time_ns()}"
+            self._versions[key] = version
+            self.state.put('conversation', self._shared_key(key),
+                           {'version': version, 'summary': summary, 'turns': turns}, self.ttl)
+
+    def _shared_key(self, key) -> str:
+        return f"{key[0]}:{key[1]}"
+
+    async def _refresh(self, key):
+        """Replace the local copy of a history with a newer one from the shared backend."""
+        shared_key = self._shared_key(key)
+        if self.state.pending('conversation', shared_key):
+            return
+        try:
+            saved = await self.state.fetch('conversation', shared_key)
+        except Exception as e:
+            print(f"Error reading shared conversation: {str(e)}")
+            return
+        # the local copy has changes the backend hasn't seen yet
+        if self.state.pending('conversation', shared_key):
+            return
+        if saved is None:
+            if key in self._versions:
+                self._drop(key)
+            return
+        if saved['version'] == self._versions.get(key):
+            return
+        if key in self._histories:
+            self._drop(key)
+        self._restore(key, saved['summary'], saved['turns'])
+        self._versions[key] = saved['version']
+
+    async def _load(self, key):
+        try:
+            saved = await asyncio.to_thread(self.db.load, *key)
+        except Exception as e:
+            print(f"Error loading conversation: {str(e)}")
+            return
+        self._checked.add(key)
+        # an append that landed while the read was in flight is newer than the disk copy
+        if saved is not None and key not in self._histories:
+            self._restore(key, *saved)
+            self._enforce_cap()
+
+    def _restore(self, key, summary: str, turns: list):
+        """Rebuild a history from wall-clock turns, skipping any that have already expired."""
+        offset = time.time() - time.monotonic()
+        cutoff = time.monotonic() - self.ttl
+        history = deque(maxlen=self.capacities.get(key[0], 10))
+        for role, content, timestamp in turns:
+            if timestamp - offset <= cutoff:
+                continue
+            history.append(Turn(role, content, timestamp - offset))
+            self.total_turns += 1
+            self.total_chars += len(content)
+        if not history:
+            return
+        self._histories[key] = history
+        if summary:
+            self._summaries[key] = summary
+        self._schedule(key, history[0].timestamp + self.ttl)
+
+    def _enforce_cap(self):
+        while self.total_chars > self.max_chars and len(self._histories) > 1:
+            oldest = next(iter(self._histories))
+            self._drop(oldest)
+            self.cap_evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            'histories': len(self._histories),
+            'turns': self.total_turns,
+            'chars': self.total_chars,
+            'heap_size': len(self._heap),
+            'overflow_evictions': self.overflow_evictions,
+            'expired_turns': self.expired_turns,
+            'cap_evictions': self.cap_evictions,
+            **({'db': self.db.stats()} if self.db is not None else {}),
+            **({'memory': self.memory.stats()} if self.memory is not None else {})
+        }
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from config import (
+    CONVERSATION_DB_PATH,
+    CONVERSATION_FLUSH_INTERVAL,
+    CONVERSATION_FLUSH_BATCH,
+    CONVERSATION_COMPACT_INTERVAL,
+    CONVERSATION_FLUSH_TIMEOUT,
+)
+
+class ConversationDB:
+    """Write-behind SQLite persistence for conversation histories.
+
+    `save()` only records the latest snapshot of a history in a pending map,
+    so repeated appends for one user between flushes collapse into a single
+    row write. A background task writes pending snapshots in one transaction
+    per batch on a worker thread, every `flush_interval` seconds or as soon as
+    `batch_size` histories are waiting. Rows carry their own expiry and are
+    compacted every `compact_interval` seconds.
+    """
+
+    def __init__(self, path: str = CONVERSATION_DB_PATH, flush_interval: float = CONVERSATION_FLUSH_INTERVAL,
+                 batch_size: int = CONVERSATION_FLUSH_BATCH, compact_interval: float = CONVERSATION_COMPACT_INTERVAL,
+                 flush_timeout: float = CONVERSATION_FLUSH_TIMEOUT):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self.flush_timeout = flush_timeout
+        self._pending = {}
+        self._wake = None
+        self._task = None
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "namespace TEXT NOT NULL, user_id INTEGER NOT NULL, summary TEXT NOT NULL, turns TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, PRIMARY KEY (namespace, user_id))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS conversations_expiry ON conversations (expires_at)")
+        # WAL readers don't wait on the writer, so loads never queue behind a flush or checkpoint
+        self._read_lock = threading.Lock()
+        self._reader = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self.loads = 0
+        self.writes = 0
+        self.flushes = 0
+        self.compacted = 0
+        self.dropped = 0
+
+    def load(self, namespace: str, user_id: int):
+        """Return (summary, [[role, content, wall_time], ...]) for an unexpired history, or None.
+
+        Blocking; call it from a worker thread.
+        """
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT summary, turns FROM conversations WHERE namespace = ? AND user_id = ? AND expires_at > ?",
+                (namespace, user_id, time.time())
+            ).fetchone()
+        self.loads += 1
+        return (row[0], json.loads(row[1])) if row else None
+
+    def save(self, namespace: str, user_id: int, summary: str, turns: list, expires_at: float):
+        self._pending[(namespace, user_id)] = (summary, turns, expires_at)
+        if len(self._pending) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _write(self, batch: dict):
+        rows = [
+            (namespace, user_id, summary, json.dumps(turns, separators=(',', ':')), expires_at)
+            for (namespace, user_id), (summary, turns, expires_at) in batch.items()
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO conversations (namespace, user_id, summary, turns, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self.writes += len(rows)
+
+    def _compact(self) -> int:
+        with self._lock:
+            removed = self._db.execute("DELETE FROM conversations WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self.compacted += removed
+        return removed
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.flushes += 1
+        except Exception as e:
+            print(f"Error writing conversations: {str(e)}")
+            # keep the batch for the next attempt unless a newer snapshot replaced it meanwhile
+            for key, snapshot in batch.items():
+                self._pending.setdefault(key, snapshot)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Stop the flusher and write what is pending, giving up after `flush_timeout` seconds."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending = len(self._pending)
+        try:
+            await asyncio.wait_for(self.flush(), self.flush_timeout)
+        except asyncio.TimeoutError:
+            # the write thread may still hold the connection, so leave it open for process exit
+            self.dropped += pending
+            print(f"Gave up flushing {pending} conversations after {self.flush_timeout}s")
+            return
+        with self._lock:
+            self._db.close()
+        with self._read_lock:
+            self._reader.close()
+
+    async def _flush_loop(self):
+        last_compact = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if time.monotonic() - last_compact >= self.compact_interval:
+                last_compact = time.monotonic()
+                try:
+                    removed = await asyncio.to_thread(self._compact)
+                    if removed:
+                        print(f"Compacted {removed} expired conversations")
+                except Exception as e:
+                    print(f"Error compacting conversations: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self._pending),
+            'loads': self.loads,
+            'writes': self.writes,
+            'flushes': self.flushes,
+            'compacted': self.compacted,
+            'dropped': self.dropped
+        }
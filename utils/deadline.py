@@ -0,0 +1,126 @@
+import asyncio
+import time
+from nextcord.utils import utcnow
+from utils.metrics import COMMAND_OUTCOMES
+from config import COMMAND_DEADLINES, INTERACTION_LIFETIME
+
+TIMEOUT_NOTE = "*this is taking longer than it should... i stopped waiting. try again in a bit.*"
+
+class Deadline:
+    """Point on the monotonic clock by which a command's work has to be done."""
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> 'Deadline':
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+class CommandCancelled(Exception):
+    """Raised out of a deadline scope when its command was cut short.
+
+    `reason` is 'deadline' (the command's own budget ran out), 'expired'
+    (the interaction token would be dead before an answer) or 'deleted'
+    (the user deleted the message that triggered it).
+    """
+
+    def __init__(self, command: str, reason: str):
+        super().__init__(f"{command} cancelled: {reason}")
+        self.command = command
+        self.reason = reason
+
+    def notice(self, partial: str = '') -> str:
+        """Text to finish the reply with, or None when nobody is left to read it."""
+        if self.reason != 'deadline':
+            return None
+        partial = partial.strip()
+        return f"{partial}\n\n{TIMEOUT_NOTE}" if partial else TIMEOUT_NOTE
+
+class DeadlineScope:
+    """Runs a block under a deadline, cancelling the task when it passes or the trigger is deleted."""
+
+    def __init__(self, registry: 'CommandDeadlines', command: str, deadline: Deadline, expiry_reason: str,
+                 message_id: int = None):
+        self.registry = registry
+        self.command = command
+        self.deadline = deadline
+        self.expiry_reason = expiry_reason
+        self.message_id = message_id
+        self.reason = None
+        self._task = None
+        self._timer = None
+
+    async def __aenter__(self):
+        self._task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(self.deadline.remaining(), self.cancel, self.expiry_reason)
+        if self.message_id is not None:
+            self.registry.by_message[self.message_id] = self
+        return self
+
+    def cancel(self, reason: str):
+        if self.reason is None and self._task is not None:
+            self.reason = reason
+            self._task.cancel()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._timer.cancel()
+        if self.message_id is not None and self.registry.by_message.get(self.message_id) is self:
+            del self.registry.by_message[self.message_id]
+        if self.reason is not None and exc_type is asyncio.CancelledError:
+            uncancel = getattr(self._task, 'uncancel', None)
+            if uncancel is not None:
+                uncancel()
+            COMMAND_OUTCOMES.inc(command=self.command, outcome=self.reason)
+            raise CommandCancelled(self.command, self.reason) from None
+        if exc_type is asyncio.CancelledError:
+            COMMAND_OUTCOMES.inc(command=self.command, outcome='cancelled')
+        else:
+            COMMAND_OUTCOMES.inc(command=self.command, outcome='ok' if exc_type is None else 'error')
+        return False
+
+class CommandDeadlines:
+    """Hands out deadline scopes and finds the one to cancel when a triggering message is deleted.
+
+    A command gets its own budget from COMMAND_DEADLINES; a slash command is
+    also bounded by what is left of its interaction token, since an answer
+    after that can't be delivered.
+    """
+
+    def __init__(self, budgets: dict = COMMAND_DEADLINES, interaction_lifetime: float = INTERACTION_LIFETIME):
+        self.budgets = budgets
+        self.interaction_lifetime = interaction_lifetime
+        self.by_message = {}
+
+    def scope(self, command: str, interaction=None, message=None) -> DeadlineScope:
+        budget = self.budgets.get(command, max(self.budgets.values()))
+        reason = 'deadline'
+        if interaction is not None:
+            lifetime = self.interaction_lifetime - (utcnow() - interaction.created_at).total_seconds()
+            if lifetime < budget:
+                budget, reason = lifetime, 'expired'
+        return DeadlineScope(
+            self, command, Deadline.after(budget), reason, message.id if message is not None else None
+        )
+
+    def cancel_message(self, message_id: int) -> bool:
+        scope = self.by_message.get(message_id)
+        if scope is None:
+            return False
+        scope.cancel('deleted')
+        return True
+
+    def stats(self) -> dict:
+        outcomes = {}
+        for (_, outcome), count in COMMAND_OUTCOMES.items():
+            outcomes[outcome] = outcomes.get(outcome, 0) + count
+        return {'in_flight_messages': len(self.by_message), 'outcomes': outcomes}
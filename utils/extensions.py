@@ -0,0 +1,55 @@
+import importlib
+import pkgutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import DISABLED_COGS, EXTENSION_IMPORT_WORKERS
+
+def discover_extensions(package: str = 'cogs', disabled: list = DISABLED_COGS) -> list:
+    """List extension modules in `package`, located through the package itself rather than the cwd."""
+    module = importlib.import_module(package)
+    return [
+        f"{package}.{info.name}"
+        for info in sorted(pkgutil.iter_modules(module.__path__), key=lambda info: info.name)
+        if not info.name.startswith('_') and info.name not in disabled
+    ]
+
+def _import(name: str) -> tuple:
+    start = time.perf_counter()
+    try:
+        importlib.import_module(name)
+        return time.perf_counter() - start, None
+    except Exception as e:
+        return time.perf_counter() - start, e
+
+def load_extensions(bot, names: list, workers: int = EXTENSION_IMPORT_WORKERS) -> list:
+    """Load extensions and return (name, import_seconds, setup_seconds, error) per extension.
+
+    Extension modules and their heavy dependencies are imported concurrently
+    on worker threads first; `load_extension` then runs each `setup()` on the
+    calling thread, where adding cogs to the bot is safe, and only re-executes
+    the already-compiled cog module.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        imports = dict(zip(names, pool.map(_import, names)))
+
+    timings = []
+    for name in names:
+        import_seconds, error = imports[name]
+        start = time.perf_counter()
+        if error is None:
+            try:
+                bot.load_extension(name)
+            except Exception as e:
+                error = e
+        timings.append((name, import_seconds, time.perf_counter() - start, error))
+    return timings
+
+def format_timings(timings: list, total: float) -> str:
+    lines = [f"Loaded {sum(1 for *_, error in timings if error is None)}/{len(timings)} cogs in {total * 1000:.0f}ms"]
+    for name, import_seconds, setup_seconds, error in timings:
+        status = f"failed: {error}" if error is not None else "ok"
+        lines.append(
+            f"  {name.rsplit('.', 1)[-1]:<10} import {import_seconds * 1000:7.1f}ms  "
+            f"setup {setup_seconds * 1000:6.1f}ms  {status}"
+        )
+    return '\n'.join(lines)
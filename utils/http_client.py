@@ -0,0 +1,84 @@
+import aiohttp
+from config import (
+    HTTP_TOTAL_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+)
+
+class HTTPClient:
+    """Bot-wide pooled HTTP client used for every outbound API call.
+
+    One aiohttp session is shared by all cogs so connections, TLS sessions
+    and DNS lookups are reused instead of being set up again per request.
+    """
+
+    def __init__(self,
+                 total_timeout: float = HTTP_TOTAL_TIMEOUT,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = HTTP_READ_TIMEOUT,
+                 limit: int = HTTP_POOL_LIMIT,
+                 limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+                 keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT):
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout,
+            connect=connect_timeout,
+            sock_read=read_timeout
+        )
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use inside the running loop."""
+        if self.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout
+            )
+        return self._session
+
+    def timeout_for(self, deadline=None) -> aiohttp.ClientTimeout:
+        """The default timeouts, with the total capped by a command deadline when there is one.
+
+        A second of grace leaves the deadline's own cancellation to fire first,
+        so a request cut short by it isn't also counted as a provider timeout.
+        """
+        if deadline is None:
+            return self.timeout
+        return aiohttp.ClientTimeout(
+            total=min(self.timeout.total, deadline.remaining() + 1.0),
+            connect=self.timeout.connect,
+            sock_read=self.timeout.sock_read
+        )
+
+    async def open(self):
+        return self.session
+
+    async def close(self):
+        if not self.closed:
+            await self._session.close()
+        self._session = None
+
+    def get(self, url: str, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.session.post(url, **kwargs)
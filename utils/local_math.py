@@ -0,0 +1,539 @@
+import ast
+import asyncio
+import math
+import multiprocessing
+import operator
+import os
+import re
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fractions import Fraction
+from config import MATH_LOCAL_TIMEOUT, MATH_LOCAL_WORKERS
+
+MAX_INPUT_CHARS = 300
+MAX_NODES = 120
+MAX_INT_BITS = 100_000
+MAX_FACTORIAL = 5000
+MAX_POLY_DEGREE = 6
+MAX_STATS_VALUES = 10_000
+MAX_RESULT_DIGITS = 1000
+
+TIMEOUT_MESSAGE = "that one's built to waste my time... i stopped evaluating it."
+BUSY_MESSAGE = "my local calculator tripped over something. try that again in a moment."
+
+class MathError(Exception):
+    """A problem with the input itself; the message is shown to the user."""
+
+_PREFIX = re.compile(
+    r"^(please\s+)?(can you\s+)?(what\s+is|what's|whats|calculate|compute|evaluate|eval|solve|find|simplify|"
+    r"how much is|convert)\s+",
+    re.IGNORECASE
+)
+_FOR_VARIABLE = re.compile(r"^for\s+([a-z])\s*[:,]?\s*|\s+for\s+([a-z])$", re.IGNORECASE)
+_TRAILING = re.compile(r"[\s?!.]+$")
+_PERCENT_OF = re.compile(r"(\d+(?:\.\d+)?)\s*%\s*of\s+")
+_IMPLICIT_MULTIPLY = re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)\s*(?=[a-df-z(]|e(?!\d))")
+_TIMES = re.compile(r"(?<=\d)\s*[x×]\s*(?=\d)")
+
+_CONVERSION = re.compile(
+    r"^(?P<value>-?\d+(?:\.\d+)?)\s*(?P<source>[a-z°/²³ ]+?)\s+(?:to|in|into|as)\s+(?P<target>[a-z°/²³ ]+)$"
+)
+_STATS = re.compile(
+    r"^(?P<op>mean|average|avg|median|mode|std|stdev|standard deviation|variance|var|sum|product|"
+    r"min|minimum|max|maximum|range)\s+(?:of\s+)?(?:the\s+)?(?:numbers\s+|values\s+|list\s+)?"
+    r"[\[(]?(?P<values>-?\d[\d.,\s\-e]*)[\])]?$"
+)
+
+# unit -> (dimension, factor to the SI base unit)
+UNITS = {}
+for _names, _dimension, _factor in (
+    (('m', 'meter', 'metre'), 'length', 1.0),
+    (('km', 'kilometer', 'kilometre'), 'length', 1000.0),
+    (('cm', 'centimeter', 'centimetre'), 'length', 0.01),
+    (('mm', 'millimeter', 'millimetre'), 'length', 0.001),
+    (('mi', 'mile'), 'length', 1609.344),
+    (('yd', 'yard'), 'length', 0.9144),
+    (('ft', 'foot', 'feet'), 'length', 0.3048),
+    (('in', 'inch', 'inche'), 'length', 0.0254),
+    (('kg', 'kilogram'), 'mass', 1.0),
+    (('g', 'gram'), 'mass', 0.001),
+    (('mg', 'milligram'), 'mass', 1e-6),
+    (('lb', 'lbs', 'pound'), 'mass', 0.45359237),
+    (('oz', 'ounce'), 'mass', 0.028349523125),
+    (('t', 'tonne', 'ton'), 'mass', 1000.0),
+    (('s', 'sec', 'second'), 'time', 1.0),
+    (('min', 'minute'), 'time', 60.0),
+    (('h', 'hr', 'hour'), 'time', 3600.0),
+    (('day',), 'time', 86400.0),
+    (('week',), 'time', 604800.0),
+    (('year', 'yr'), 'time', 31557600.0),
+    (('l', 'liter', 'litre'), 'volume', 0.001),
+    (('ml', 'milliliter', 'millilitre'), 'volume', 1e-6),
+    (('gal', 'gallon'), 'volume', 0.003785411784),
+    (('cup',), 'volume', 0.0002365882365),
+    (('m/s', 'mps'), 'speed', 1.0),
+    (('km/h', 'kph', 'kmh'), 'speed', 1 / 3.6),
+    (('mph',), 'speed', 0.44704),
+    (('knot', 'kn'), 'speed', 0.514444),
+    (('b', 'byte'), 'data', 1.0),
+    (('kb', 'kilobyte'), 'data', 1e3),
+    (('mb', 'megabyte'), 'data', 1e6),
+    (('gb', 'gigabyte'), 'data', 1e9),
+    (('tb', 'terabyte'), 'data', 1e12),
+    (('kib', 'kibibyte'), 'data', 1024.0),
+    (('mib', 'mebibyte'), 'data', 1024.0 ** 2),
+    (('gib', 'gibibyte'), 'data', 1024.0 ** 3),
+):
+    for _name in _names:
+        UNITS[_name] = (_dimension, _factor)
+
+TEMPERATURES = {
+    'c': 'c', '°c': 'c', 'celsius': 'c', 'degrees celsius': 'c', 'degree celsius': 'c',
+    'f': 'f', '°f': 'f', 'fahrenheit': 'f', 'degrees fahrenheit': 'f', 'degree fahrenheit': 'f',
+    'k': 'k', 'kelvin': 'k',
+}
+
+def _factorial(n):
+    if not float(n).is_integer() or n < 0:
+        raise MathError("factorial only takes non-negative whole numbers.")
+    if n > MAX_FACTORIAL:
+        raise MathError(f"i only do factorials up to {MAX_FACTORIAL}!... anything bigger is just showing off.")
+    return math.factorial(int(n))
+
+def _log(x, base=None):
+    return math.log(x) if base is None else math.log(x, base)
+
+FUNCTIONS = {
+    'sqrt': math.sqrt, 'cbrt': lambda x: math.copysign(abs(x) ** (1 / 3), x),
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'asin': math.asin, 'acos': math.acos, 'atan': math.atan,
+    'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh,
+    'log': _log, 'ln': math.log, 'log10': math.log10, 'log2': math.log2, 'exp': math.exp,
+    'abs': abs, 'floor': math.floor, 'ceil': math.ceil, 'round': round,
+    'factorial': _factorial, 'gcd': math.gcd, 'lcm': math.lcm,
+    'degrees': math.degrees, 'radians': math.radians,
+}
+CONSTANTS = {'pi': math.pi, 'e': math.e, 'tau': math.tau}
+
+def _check_int(value):
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise MathError("that number is too large to be worth writing down.")
+    return value
+
+def _power(base, exponent):
+    if isinstance(exponent, Fraction):
+        exponent = int(exponent) if exponent.denominator == 1 else float(exponent)
+    if isinstance(base, (int, Fraction)) and isinstance(exponent, int):
+        base_fraction = Fraction(base)
+        size = max(abs(base_fraction.numerator).bit_length(), base_fraction.denominator.bit_length())
+        if size > 1 and (size - 1) * abs(exponent) > MAX_INT_BITS:
+            raise MathError("that number is too large to be worth writing down.")
+    return base ** exponent
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+class Polynomial:
+    """Polynomial in one variable with exact (Fraction) or float coefficients."""
+
+    def __init__(self, coefficients: dict):
+        self.coefficients = {degree: c for degree, c in coefficients.items() if c != 0}
+
+    @property
+    def degree(self) -> int:
+        return max(self.coefficients, default=0)
+
+    def __add__(self, other):
+        other = as_polynomial(other)
+        result = dict(self.coefficients)
+        for degree, c in other.coefficients.items():
+            result[degree] = result.get(degree, 0) + c
+        return Polynomial(result)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Polynomial({degree: -c for degree, c in self.coefficients.items()})
+
+    def __pos__(self):
+        return self
+
+    def __sub__(self, other):
+        return self + (-as_polynomial(other))
+
+    def __rsub__(self, other):
+        return as_polynomial(other) - self
+
+    def __mul__(self, other):
+        other = as_polynomial(other)
+        result = {}
+        for d1, c1 in self.coefficients.items():
+            for d2, c2 in other.coefficients.items():
+                result[d1 + d2] = result.get(d1 + d2, 0) + c1 * c2
+        if max(result, default=0) > MAX_POLY_DEGREE:
+            raise MathError(f"i only solve polynomial equations up to degree {MAX_POLY_DEGREE}.")
+        return Polynomial(result)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Polynomial):
+            if other.degree != 0:
+                raise MathError("dividing by the variable makes this more than a simple equation.")
+            other = other.coefficients.get(0, 0)
+        return Polynomial({degree: c / other for degree, c in self.coefficients.items()})
+
+    def __pow__(self, exponent):
+        if isinstance(exponent, Polynomial) and exponent.degree == 0:
+            exponent = exponent.coefficients.get(0, 0)
+        if not isinstance(exponent, (int, Fraction)) or exponent != int(exponent) or exponent < 0:
+            raise MathError("the variable can only be raised to whole-number powers here.")
+        result = Polynomial({0: 1})
+        for _ in range(int(exponent)):
+            result = result * self
+        return result
+
+def as_polynomial(value) -> Polynomial:
+    return value if isinstance(value, Polynomial) else Polynomial({0: value})
+
+class Evaluator:
+    """Walks a parsed expression allowing only numbers, arithmetic and whitelisted functions."""
+
+    def __init__(self, variable: str = None):
+        self.variable = variable
+
+    def evaluate(self, node):
+        if isinstance(node, ast.Expression):
+            return self.evaluate(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            # equations are solved exactly, so their constants become fractions
+            return Fraction(node.value) if self.variable else node.value
+        if isinstance(node, ast.Name):
+            if node.id == self.variable:
+                return Polynomial({1: 1})
+            if node.id in CONSTANTS:
+                return CONSTANTS[node.id]
+            raise MathError(f"i don't know what `{node.id}` is.")
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            left, right = self.evaluate(node.left), self.evaluate(node.right)
+            if isinstance(right, Polynomial) and not isinstance(left, Polynomial):
+                left = as_polynomial(left)
+            if isinstance(left, Polynomial) and isinstance(node.op, ast.Pow):
+                return left ** right
+            if isinstance(left, Polynomial) and type(node.op) not in (ast.Add, ast.Sub, ast.Mult, ast.Div):
+                raise MathError("that operation on the variable is beyond a simple equation.")
+            return _check_int(BINARY_OPERATORS[type(node.op)](left, right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            return UNARY_OPERATORS[type(node.op)](self.evaluate(node.operand))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+            args = [self.evaluate(arg) for arg in node.args]
+            if any(isinstance(arg, Polynomial) for arg in args):
+                raise MathError("functions of the variable are beyond a simple equation.")
+            return _check_int(FUNCTIONS[node.func.id](*args))
+        raise MathError("that expression has parts i won't evaluate.")
+
+def _names(tree) -> set:
+    called = {node.func.id for node in ast.walk(tree) if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)}
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} - called
+
+def _parse(source: str):
+    """Parse and vet an expression; returns the tree or None if it isn't plain math."""
+    try:
+        tree = ast.parse(source, mode='eval')
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    nodes = list(ast.walk(tree))
+    if len(nodes) > MAX_NODES:
+        return None
+    allowed = (ast.Expression, ast.Constant, ast.Name, ast.Load, ast.BinOp, ast.UnaryOp, ast.Call,
+               *BINARY_OPERATORS, *UNARY_OPERATORS)
+    if not all(isinstance(node, allowed) for node in nodes):
+        return None
+    for node in nodes:
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS):
+            return None
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            return None
+    return tree
+
+def _to_python(expression: str) -> str:
+    expression = expression.replace('^', '**').replace('÷', '/').replace('−', '-')
+    expression = _PERCENT_OF.sub(r"(\1/100)*", expression)
+    expression = _TIMES.sub('*', expression)
+    expression = _IMPLICIT_MULTIPLY.sub(r"\1*", expression)
+    return re.sub(r"\)\s*\(", ")*(", expression)
+
+def _unit(name: str):
+    name = ' '.join(name.split())
+    if name in TEMPERATURES:
+        return 'temperature', TEMPERATURES[name]
+    for candidate in (name, name[:-1] if name.endswith('s') else None, name[:-2] if name.endswith('es') else None):
+        if candidate and candidate in UNITS:
+            return UNITS[candidate]
+    return None
+
+def classify(prompt: str):
+    """Map a prompt to a locally solvable problem, or None if it should go to the LLM.
+
+    Problems are plain tuples so they can be sent to a worker process:
+    ('convert', value, source, target), ('stats', op, values),
+    ('equation', lhs, rhs, variable) or ('expression', source).
+    """
+    text = ' '.join(prompt.strip().split()).lower()
+    if not text or len(text) > MAX_INPUT_CHARS:
+        return None
+    text = _TRAILING.sub('', _PREFIX.sub('', text))
+    text = text.strip('`')
+    variable_hint = None
+    match = _FOR_VARIABLE.search(text)
+    if match:
+        variable_hint = match.group(1) or match.group(2)
+        text = _FOR_VARIABLE.sub('', text).strip()
+
+    match = _CONVERSION.match(text)
+    if match:
+        source, target = _unit(match.group('source')), _unit(match.group('target'))
+        if source and target and source[0] == target[0]:
+            return ('convert', float(match.group('value')), match.group('source').strip(), match.group('target').strip())
+
+    match = _STATS.match(text)
+    if match:
+        values = [v for v in re.split(r"[,\s]+", match.group('values').strip()) if v]
+        try:
+            numbers = [float(v) for v in values]
+        except ValueError:
+            numbers = None
+        if numbers and len(numbers) <= MAX_STATS_VALUES:
+            return ('stats', match.group('op'), numbers)
+
+    if text.count('=') == 1 and not re.search(r"[<>!]=|==", text):
+        lhs, rhs = (_to_python(side.strip()) for side in text.split('='))
+        left, right = _parse(lhs), _parse(rhs)
+        if left is not None and right is not None:
+            names = (_names(left) | _names(right)) - set(CONSTANTS)
+            if len(names) == 1 and (variable_hint is None or variable_hint in names):
+                return ('equation', lhs, rhs, names.pop())
+        return None
+
+    source = _to_python(text.rstrip('='))
+    tree = _parse(source)
+    if tree is None or _names(tree) - set(CONSTANTS):
+        return None
+    if not any(isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call)) for node in ast.walk(tree)):
+        return None
+    return ('expression', source)
+
+def _scientific(value) -> str:
+    """Scientific notation for numbers too long to print (or convert to str) in full."""
+    magnitude = math.log10(abs(value.numerator)) - math.log10(value.denominator)
+    exponent = math.floor(magnitude)
+    return f"{'-' if value < 0 else ''}{10 ** (magnitude - exponent):.10f}e{exponent}"
+
+def format_number(value) -> str:
+    if isinstance(value, Fraction):
+        if value.denominator == 1:
+            return format_number(value.numerator)
+        if max(abs(value.numerator), value.denominator).bit_length() * 0.30103 > MAX_RESULT_DIGITS:
+            return f"≈ {_scientific(value)}"
+        return f"{value.numerator}/{value.denominator} (≈ {float(value):.10g})"
+    if isinstance(value, int):
+        if value.bit_length() * 0.30103 > MAX_RESULT_DIGITS:
+            return _scientific(value)
+        return str(value)
+    if isinstance(value, complex):
+        imaginary = f"{abs(value.imag):.10g}i"
+        if abs(value.real) < 1e-12:
+            return imaginary if value.imag >= 0 else f"-{imaginary}"
+        return f"{format_number(value.real)} {'+' if value.imag >= 0 else '-'} {imaginary}"
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise MathError("that result isn't a finite number.")
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.12g}"
+    return str(value)
+
+def _convert(value: float, source: str, target: str) -> str:
+    dimension, from_factor = _unit(source)
+    _, to_factor = _unit(target)
+    if dimension == 'temperature':
+        kelvin = {'c': value + 273.15, 'f': (value - 32) * 5 / 9 + 273.15, 'k': value}[from_factor]
+        result = {'c': kelvin - 273.15, 'f': (kelvin - 273.15) * 9 / 5 + 32, 'k': kelvin}[to_factor]
+    else:
+        result = value * from_factor / to_factor
+    return f"{format_number(value)} {source} = **{format_number(round(result, 10))} {target}**"
+
+def _stats(op: str, numbers: list) -> str:
+    import numpy as np
+    values = np.asarray(numbers, dtype=float)
+    names = {'average': 'mean', 'avg': 'mean', 'stdev': 'std', 'standard deviation': 'std', 'var': 'variance',
+             'minimum': 'min', 'maximum': 'max'}
+    op = names.get(op, op)
+    if op == 'mode':
+        unique, counts = np.unique(values, return_counts=True)
+        modes = unique[counts == counts.max()]
+        result = ', '.join(format_number(float(v)) for v in modes)
+    else:
+        compute = {
+            'mean': np.mean, 'median': np.median, 'std': np.std, 'variance': np.var, 'sum': np.sum,
+            'product': np.prod, 'min': np.min, 'max': np.max, 'range': np.ptp,
+        }[op]
+        result = format_number(float(compute(values)))
+    note = " (population)" if op in ('std', 'variance') else ""
+    return f"{op}{note} of {len(numbers)} values = **{result}**"
+
+def _solve(lhs: str, rhs: str, variable: str) -> str:
+    evaluator = Evaluator(variable)
+    polynomial = as_polynomial(evaluator.evaluate(ast.parse(lhs, mode='eval'))) - \
+        as_polynomial(evaluator.evaluate(ast.parse(rhs, mode='eval')))
+    c = polynomial.coefficients
+    degree = polynomial.degree
+    if degree == 0:
+        return "**every value works**" if not c else "**no solution**... the equation contradicts itself."
+    if degree == 1:
+        return f"**{variable} = {format_number(-c.get(0, 0) / c[1])}**"
+    if degree == 2:
+        a, b, k = c[2], c.get(1, 0), c.get(0, 0)
+        discriminant = b * b - 4 * a * k
+        if isinstance(discriminant, Fraction) and discriminant >= 0:
+            root = Fraction(math.isqrt(discriminant.numerator), math.isqrt(discriminant.denominator))
+            if root * root == discriminant:
+                roots = sorted({(-b - root) / (2 * a), (-b + root) / (2 * a)})
+                return ' or '.join(f"**{variable} = {format_number(r)}**" for r in roots)
+    import numpy as np
+    roots = np.roots([float(c.get(d, 0)) for d in range(degree, -1, -1)])
+    values = sorted({complex(round(r.real, 12), round(r.imag, 12)) for r in roots}, key=lambda r: (r.real, r.imag))
+    return ' or '.join(
+        f"**{variable} = {format_number(r.real if abs(r.imag) < 1e-12 else r)}**" for r in values
+    )
+
+def evaluate(problem: tuple) -> str:
+    """Solve a classified problem; runs in a worker process and always returns the reply text."""
+    try:
+        kind = problem[0]
+        if kind == 'convert':
+            return _convert(*problem[1:])
+        if kind == 'stats':
+            return _stats(*problem[1:])
+        if kind == 'equation':
+            return _solve(*problem[1:])
+        source = problem[1]
+        result = Evaluator().evaluate(ast.parse(source, mode='eval'))
+        return f"`{source.replace('**', '^')}` = **{format_number(result)}**"
+    except MathError as e:
+        return str(e)
+    except ZeroDivisionError:
+        return "division by zero... some things can't be undone."
+    except (ValueError, OverflowError, TypeError) as e:
+        return f"that doesn't compute: {str(e)}."
+
+def _register(pids):
+    pids.put(os.getpid())
+
+def _warm():
+    import numpy  # noqa: F401 - load it in the worker before the first timed request
+    return True
+
+class LocalMath:
+    """Answers prompts that `classify` recognises without an LLM call.
+
+    Evaluation runs in a small pool of worker processes, spawned and warmed
+    by `start()`. Parsing is limited in size and node count, and integer
+    growth is capped. Each evaluation also has a wall-clock timeout; on
+    expiry the pool is torn down and its workers, which report their PIDs
+    as they start, are killed, so hostile input can't tie up the event loop
+    or a core.
+    """
+
+    def __init__(self, timeout: float = MATH_LOCAL_TIMEOUT, workers: int = MATH_LOCAL_WORKERS):
+        self.timeout = timeout
+        self.workers = workers
+        self._pool = None
+        self._starting = None
+        self._worker_pids = {}
+        self._semaphore = None
+        self.solved = 0
+        self.timeouts = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._pool is not None
+
+    def classify(self, prompt: str):
+        return classify(prompt)
+
+    def start(self):
+        """Spawn and warm the worker pool in the background, so the first prompt doesn't wait for it."""
+        if self._pool is None and (self._starting is None or self._starting.done()):
+            self._starting = asyncio.ensure_future(self._spawn())
+
+    async def solve(self, problem: tuple) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            pool = None
+            try:
+                pool = await self._ready_pool()
+                answer = await asyncio.wait_for(loop.run_in_executor(pool, evaluate, problem), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._discard(pool)
+                return TIMEOUT_MESSAGE
+            except BrokenProcessPool:
+                if pool is not None:
+                    self._discard(pool)
+                return BUSY_MESSAGE
+        self.solved += 1
+        return answer
+
+    async def _ready_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self.start()
+            await asyncio.shield(self._starting)
+            if self._pool is None:
+                raise BrokenProcessPool("local math workers failed to start")
+        return self._pool
+
+    async def _spawn(self):
+        context = multiprocessing.get_context('spawn')
+        pids = context.SimpleQueue()
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                   initializer=_register, initargs=(pids,))
+        self._worker_pids[pool] = pids
+        loop = asyncio.get_running_loop()
+        try:
+            # one warm-up per worker, submitted together so every worker is spawned now
+            await asyncio.gather(*(loop.run_in_executor(pool, _warm) for _ in range(self.workers)))
+        except Exception as e:
+            print(f"Error starting local math workers: {str(e)}")
+            self._discard(pool)
+            return
+        if pool in self._worker_pids:
+            self._pool = pool
+
+    def _discard(self, pool: ProcessPoolExecutor):
+        if self._pool is pool:
+            self._pool = None
+        pids = self._worker_pids.pop(pool, None)
+        # a running task can't be cancelled, so stop its worker directly
+        while pids is not None and not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+        if pids is not None:
+            pids.close()
+
+    def close(self):
+        for pool in list(self._worker_pids):
+            self._discard(pool)
+
+    def stats(self) -> dict:
+        return {'solved': self.solved, 'timeouts': self.timeouts}
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from config import (
+    LOOP_MONITOR_INTERVAL,
+    LOOP_BLOCK_THRESHOLD,
+    LOOP_LAG_WINDOW,
+    PROFILE_DIR,
+    PROFILE_INTERVAL,
+)
+from utils.metrics import LOOP_LAG, LOOP_BLOCKS, percentile
+
+IDLE_FRAME = 'selectors.py:select'
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class LoopMonitor:
+    """Measures event-loop lag and catches callbacks that block the loop.
+
+    A ticker task sleeps for `interval` and records how late it wakes up.
+    A watchdog thread checks the ticker's heartbeat. When the heartbeat is
+    older than `threshold`, the loop is stuck inside one callback, so the
+    loop thread's current stack is captured and logged once per stall.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD,
+                 window: int = LOOP_LAG_WINDOW, snapshots: int = 10):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = deque(maxlen=window)
+        self.snapshots = deque(maxlen=snapshots)
+        self.blocks = 0
+        self.thread_id = None
+        self._heartbeat = time.monotonic()
+        self._reported = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self.thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples.append(lag)
+            LOOP_LAG.observe(lag)
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold + self.interval or beat == self._reported:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self._reported = beat
+            stack = ''.join(traceback.format_stack(frame))
+            self.blocks += 1
+            LOOP_BLOCKS.inc()
+            self.snapshots.append((time.time(), stalled, stack))
+            print(f"Event loop blocked for {stalled:.2f}s+, stack of the running callback:\n{stack}")
+
+    def stats(self) -> dict:
+        samples = list(self.samples)
+        return {
+            'p50': percentile(samples, 0.5),
+            'p95': percentile(samples, 0.95),
+            'p99': percentile(samples, 0.99),
+            'max': max(samples, default=None),
+            'blocks': self.blocks
+        }
+
+class SamplingProfiler:
+    """Samples the event-loop thread's stack from a background thread.
+
+    Samples are counted per collapsed stack ("a;b;c"), the folded format
+    read by flamegraph.pl and speedscope. `stop()` writes them to
+    PROFILE_DIR and returns a short summary of the hottest functions.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, directory: str = PROFILE_DIR):
+        self.interval = interval
+        self.directory = directory
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._timer = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, seconds: float, on_finish=None):
+        """Profile the calling (loop) thread for `seconds`, then stop and call `on_finish(path, summary)`."""
+        if self.running:
+            raise RuntimeError("profiler is already running")
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._sample, args=(threading.get_ident(),), name='loop-profiler', daemon=True
+        )
+        self._thread.start()
+        self._timer = asyncio.get_running_loop().call_later(seconds, self._finish, on_finish)
+
+    def _finish(self, on_finish):
+        self._timer = None
+        path, summary = self.stop()
+        if on_finish is not None:
+            on_finish(path, summary)
+
+    def stop(self):
+        """Stop sampling and dump the profile; returns (path, summary)."""
+        if not self.running:
+            raise RuntimeError("profiler is not running")
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        return self.dump(), self.summary()
+
+    def _sample(self, thread_id: int):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+                self.samples += 1
+
+    def dump(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        path = os.path.join(self.directory, f"loop-{stamp}-{os.getpid()}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def summary(self, top: int = 8) -> str:
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            names = stack.split(';')
+            own[names[-1]] += count
+            for name in set(names):
+                total[name] += count
+        if not self.samples:
+            return "no samples collected"
+        idle = own.pop(IDLE_FRAME, 0)
+        # frames under every sample (the loop's own run_forever chain) say nothing about hot spots
+        busy = [(name, count) for name, count in total.most_common() if count < self.samples and name != IDLE_FRAME]
+        lines = [
+            f"{self.samples} samples every {self.interval * 1000:.0f}ms, idle {idle / self.samples:.1%}",
+            "**self**"
+        ]
+        lines += [f"- {name}: {count / self.samples:.1%}" for name, count in own.most_common(top)]
+        lines.append("**total**")
+        lines += [f"- {name}: {count / self.samples:.1%}" for name, count in busy[:top]]
+        return '\n'.join(lines)
@@ -0,0 +1,188 @@
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+from config import (
+    MEMORY_DIM,
+    MEMORY_TOP_K,
+    MEMORY_MIN_SCORE,
+    MEMORY_MAX_EXCHANGES,
+    MEMORY_MAX_ROWS,
+    MEMORY_TTL,
+    MEMORY_SNIPPET_CHARS,
+)
+
+_WORD_RE = re.compile(r"\w\w+")
+_STOPWORDS = frozenset("""
+    about after again all also am an and any are as at be been but by can could did do does for from get got
+    had has have he her him his how if in into is it its just let like me more my no not now of on or our out
+    should so some than that the their them then there these they this to too up us was we were what when where
+    which who why will with would you your yours i'm it's don't can't
+""".split())
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+def terms(text: str) -> list:
+    """Lowercased words minus stopwords, with common English suffixes stripped."""
+    words = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        words.append(word)
+    return words
+
+def clip(text: str, limit: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+class UserMemory:
+    """One user's past exchanges in a namespace: term-frequency rows plus the text they came from."""
+
+    __slots__ = ('vectors', 'exchanges', 'question')
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((4, dim), dtype=np.float32)
+        self.exchanges = []
+        self.question = None
+
+    def __len__(self) -> int:
+        return len(self.exchanges)
+
+class MemoryIndex:
+    """Long-term memory of past exchanges, searched by TF-IDF similarity.
+
+    Each user turn is paired with the assistant turn that answers it and
+    indexed as one document. Words are hashed into a fixed number of
+    buckets with a sign bit, so vectors need no vocabulary and stay stable
+    across restarts. Term frequencies are stored per user in a NumPy
+    matrix; IDF weights come from bucket document counts kept across all
+    users and are applied at query time, so adding a document never
+    rewrites older rows.
+
+    Memory is bounded per user (`max_exchanges`) and overall (`max_rows`,
+    evicting the least recently active users first).
+    """
+
+    def __init__(self, dim: int = MEMORY_DIM, top_k: int = MEMORY_TOP_K, min_score: float = MEMORY_MIN_SCORE,
+                 max_exchanges: int = MEMORY_MAX_EXCHANGES, max_rows: int = MEMORY_MAX_ROWS,
+                 ttl: float = MEMORY_TTL, snippet_chars: int = MEMORY_SNIPPET_CHARS):
+        self.dim = dim
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_exchanges = max_exchanges
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.snippet_chars = snippet_chars
+        self._users = OrderedDict()
+        self._df = np.zeros(dim, dtype=np.float32)
+        self.rows = 0
+        self.searches = 0
+        self.hits = 0
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """Signed hashed term frequencies with sublinear (1 + log tf) scaling."""
+        counts = {}
+        for word in terms(text):
+            h = zlib.crc32(word.encode('utf-8'))
+            bucket = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for (index, sign), count in counts.items():
+            vector[index] += sign * (1.0 + math.log(count))
+        return vector
+
+    def add(self, namespace: str, user_id: int, role: str, content: str):
+        key = (namespace, user_id)
+        memory = self._users.get(key)
+        if memory is None:
+            memory = self._users[key] = UserMemory(self.dim)
+            self._enforce_limits()
+        else:
+            self._users.move_to_end(key)
+        if role == 'user':
+            memory.question = content
+            return
+        if memory.question is None:
+            return
+        question, memory.question = memory.question, None
+        vector = self.vectorize(f"{question}\n{content}")
+        if not vector.any():
+            return
+
+        if len(memory) >= self.max_exchanges:
+            self._remove_oldest(memory)
+        if len(memory) == len(memory.vectors):
+            grown = np.zeros((min(len(memory.vectors) * 2, self.max_exchanges), self.dim), dtype=np.float32)
+            grown[:len(memory)] = memory.vectors[:len(memory)]
+            memory.vectors = grown
+        memory.vectors[len(memory)] = vector
+        memory.exchanges.append((question, content, time.time()))
+        self._df += vector != 0
+        self.rows += 1
+        self._enforce_limits()
+
+    def search(self, namespace: str, user_id: int, query: str, exclude: set = frozenset(), k: int = None) -> list:
+        """Top `k` past exchanges most similar to `query` as (question, answer, score), best first."""
+        memory = self._users.get((namespace, user_id))
+        if memory is None or not len(memory):
+            return []
+        self.searches += 1
+        idf = np.log((self.rows + 1) / (self._df + 1)) + 1.0
+        q = self.vectorize(query) * idf
+        q_norm = np.linalg.norm(q)
+        if not q_norm:
+            return []
+        weighted = memory.vectors[:len(memory)] * idf
+        norms = np.linalg.norm(weighted, axis=1) * q_norm
+        scores = weighted @ q / np.maximum(norms, 1e-9)
+
+        cutoff = time.time() - self.ttl
+        results = []
+        for index in np.argsort(-scores):
+            score = float(scores[index])
+            if score < self.min_score or len(results) >= (k or self.top_k):
+                break
+            question, answer, stamp = memory.exchanges[index]
+            if stamp < cutoff or question in exclude or answer in exclude:
+                continue
+            results.append((question, answer, score))
+        self.hits += bool(results)
+        return results
+
+    def notes(self, results: list) -> list:
+        """Short lines for a prompt, one per recalled exchange."""
+        half = self.snippet_chars // 2
+        return [
+            f"- user: {clip(question, half)} / you: {clip(answer, self.snippet_chars - half)}"
+            for question, answer, _ in results
+        ]
+
+    def _enforce_limits(self):
+        while (self.rows > self.max_rows or len(self._users) > self.max_rows) and len(self._users) > 1:
+            self._evict(next(iter(self._users)))
+
+    def _remove_oldest(self, memory: UserMemory):
+        self._df -= memory.vectors[0] != 0
+        memory.vectors[:len(memory) - 1] = memory.vectors[1:len(memory)]
+        memory.exchanges.pop(0)
+        self.rows -= 1
+
+    def _evict(self, key):
+        memory = self._users.pop(key)
+        if len(memory):
+            self._df -= (memory.vectors[:len(memory)] != 0).sum(axis=0)
+            self.rows -= len(memory)
+
+    def stats(self) -> dict:
+        return {
+            'users': len(self._users),
+            'exchanges': self.rows,
+            'searches': self.searches,
+            'hits': self.hits,
+            'bytes': sum(memory.vectors.nbytes for memory in self._users.values())
+        }
@@ -0,0 +1,264 @@
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from nextcord.utils import utcnow
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+def percentile(values, q: float):
+    """Nearest-rank percentile of raw samples; None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def items(self) -> list:
+        return list(self._values.items())
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, key, {}, value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.label_names, key, extra)} {value}")
+        return lines
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class CallbackGauge(Metric):
+    """Gauge whose samples are read from `callback()` at scrape time as (label values, value) pairs."""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: tuple, callback):
+        super().__init__(name, help, labels)
+        self.callback = callback
+
+    def samples(self):
+        for key, value in self.callback():
+            yield self.name, tuple(str(part) for part in key), {}, value
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def quantile(self, q: float, **labels):
+        """Estimate a quantile by interpolating inside the bucket it falls in."""
+        entry = self._values.get(self._key(labels))
+        if not entry or not entry[2]:
+            return None
+        target = q * entry[2]
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, entry[0]):
+            if count and seen + count >= target:
+                return lower + (bound - lower) * (target - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]
+
+    def keys(self):
+        return list(self._values)
+
+    def samples(self):
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key, {'le': bound}, cumulative
+            yield f"{self.name}_bucket", key, {'le': '+Inf'}, count
+            yield f"{self.name}_sum", key, {}, total
+            yield f"{self.name}_count", key, {}, count
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, labels: tuple, callback) -> CallbackGauge:
+        return self.register(CallbackGauge(name, help, labels, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+COMMAND_LATENCY = registry.histogram(
+    'lacri_command_latency_seconds', 'End-to-end command latency from Discord message creation', ('command', 'kind')
+)
+COMMANDS_IN_FLIGHT = registry.gauge(
+    'lacri_commands_in_flight', 'Commands currently being handled', ('command',)
+)
+PROVIDER_LATENCY = registry.histogram(
+    'lacri_provider_request_seconds', 'Outbound API call latency', ('provider', 'mode')
+)
+PROVIDER_ERRORS = registry.counter(
+    'lacri_provider_errors_total', 'Outbound API calls that failed', ('provider', 'status')
+)
+PROVIDER_IN_FLIGHT = registry.gauge(
+    'lacri_provider_in_flight', 'Outbound API calls currently in flight', ('provider',)
+)
+TOKENS = registry.counter(
+    'lacri_tokens_total', 'Tokens reported by LLM providers', ('provider', 'kind')
+)
+COMMAND_OUTCOMES = registry.counter(
+    'lacri_command_outcomes_total', 'How commands run under a deadline ended', ('command', 'outcome')
+)
+LOOP_LAG = registry.histogram(
+    'lacri_event_loop_lag_seconds', 'How late the event loop ran a timer callback',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+LOOP_BLOCKS = registry.counter(
+    'lacri_event_loop_blocks_total', 'Times a single callback held the event loop past the block threshold'
+)
+
+def command_started(command: str):
+    COMMANDS_IN_FLIGHT.inc(command=command)
+
+def command_finished(command: str, kind: str, created_at):
+    """Record end-to-end latency measured from the Discord snowflake time, so gateway delivery counts too."""
+    COMMANDS_IN_FLIGHT.dec(command=command)
+    latency = max(0.0, (utcnow() - created_at).total_seconds())
+    COMMAND_LATENCY.observe(latency, command=command, kind=kind)
+
+@contextmanager
+def track_command(command: str, kind: str, created_at):
+    command_started(command)
+    try:
+        yield
+    finally:
+        command_finished(command, kind, created_at)
+
+@contextmanager
+def track_call(provider: str, mode: str):
+    """Record latency, in-flight count and failures of one outbound API call."""
+    PROVIDER_IN_FLIGHT.inc(provider=provider)
+    start = time.monotonic()
+    try:
+        yield
+    except Exception as e:
+        PROVIDER_ERRORS.inc(provider=provider, status=getattr(e, 'status', type(e).__name__))
+        raise
+    finally:
+        PROVIDER_IN_FLIGHT.dec(provider=provider)
+        PROVIDER_LATENCY.observe(time.monotonic() - start, provider=provider, mode=mode)
+
+def record_usage(provider: str, usage: dict):
+    if not usage:
+        return
+    TOKENS.inc(usage.get('prompt_tokens', 0), provider=provider, kind='prompt')
+    TOKENS.inc(usage.get('completion_tokens', 0), provider=provider, kind='completion')
+
+class MetricsServer:
+    """Serves the registry in Prometheus text format on a local port."""
+
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f'Metrics available at http://{self.host}:{self.port}/metrics')
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
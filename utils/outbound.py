@@ -0,0 +1,88 @@
+import asyncio
+import time
+from collections import OrderedDict
+from config import (
+    OUTBOUND_CHANNEL_RATE,
+    OUTBOUND_CHANNEL_BURST,
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_MAX_CHANNELS,
+)
+from utils.admission import TokenBucket
+
+class ChannelLane:
+    """Serialised, paced access to one channel's message endpoints."""
+
+    def __init__(self, pipeline, rate: float, burst: float):
+        self.pipeline = pipeline
+        self.bucket = TokenBucket(rate, burst)
+        self.lock = asyncio.Lock()
+
+    async def run(self, call, *args, **kwargs):
+        """Await `call(*args, **kwargs)` once this channel and the global budget allow it."""
+        async with self.lock:
+            start = time.monotonic()
+            while True:
+                wait = max(self._wait(self.bucket), self._wait(self.pipeline.global_bucket))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.bucket.tokens -= 1
+            self.pipeline.global_bucket.tokens -= 1
+            self.pipeline.record(time.monotonic() - start)
+            return await call(*args, **kwargs)
+
+    @staticmethod
+    def _wait(bucket: TokenBucket) -> float:
+        return 0.0 if bucket.refill() >= 1 else bucket.retry_after()
+
+class OutboundPipeline:
+    """Paces every bot send, edit and delete per channel and bot-wide.
+
+    Each channel gets a lane holding a lock, so one answer's messages go out
+    in order, and a token bucket sized below Discord's per-channel message
+    bucket; a shared bucket stays under the global request limit. Calls wait
+    their turn here instead of running into 429s and retry storms.
+    """
+
+    def __init__(self, rate: float = OUTBOUND_CHANNEL_RATE, burst: float = OUTBOUND_CHANNEL_BURST,
+                 global_rate: float = OUTBOUND_GLOBAL_RATE, max_channels: int = OUTBOUND_MAX_CHANNELS):
+        self.rate = rate
+        self.burst = burst
+        self.max_channels = max_channels
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._lanes = OrderedDict()
+        self.calls = 0
+        self.paced = 0
+        self.total_wait = 0.0
+        self.attachments = 0
+
+    def lane(self, channel_id: int) -> ChannelLane:
+        lane = self._lanes.get(channel_id)
+        if lane is None:
+            lane = self._lanes[channel_id] = ChannelLane(self, self.rate, self.burst)
+            self._evict()
+        else:
+            self._lanes.move_to_end(channel_id)
+        return lane
+
+    def record(self, waited: float):
+        self.calls += 1
+        if waited > 0:
+            self.paced += 1
+            self.total_wait += waited
+
+    def _evict(self):
+        for channel_id in list(self._lanes):
+            if len(self._lanes) <= self.max_channels:
+                break
+            if not self._lanes[channel_id].lock.locked():
+                del self._lanes[channel_id]
+
+    def stats(self) -> dict:
+        return {
+            'channels': len(self._lanes),
+            'calls': self.calls,
+            'paced': self.paced,
+            'avg_wait': self.total_wait / self.paced if self.paced else 0.0,
+            'attachments': self.attachments
+        }
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from utils.metrics import track_call, record_usage
+from config import (
+    GROQ_API_KEY,
+    TOGETHER_API_KEY,
+    SAMBANOVA_API_KEY,
+    GROQ_API_URL,
+    TOGETHER_API_URL,
+    SAMBANOVA_API_URL,
+    GROQ_MAX_CONCURRENCY,
+    TOGETHER_MAX_CONCURRENCY,
+    SAMBANOVA_MAX_CONCURRENCY,
+)
+
+class ProviderError(Exception):
+    """Raised when a provider answers with a non-200 status."""
+
+    def __init__(self, provider: str, status: int, message: str):
+        super().__init__(f"{provider} returned {status}: {message}")
+        self.provider = provider
+        self.status = status
+        self.message = message
+
+class LLMProvider:
+    """Async chat completion client for an OpenAI-compatible endpoint.
+
+    Requests go through the bot's pooled HTTP client and a per-provider
+    semaphore, so concurrent completions are coroutines, not threads.
+    """
+
+    name = None
+
+    def __init__(self, http, base_url: str, api_key: str, max_concurrency: int):
+        self.http = http
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, model: str, messages: list, **params) -> dict:
+        return {"model": model, "messages": messages, **params}
+
+    async def complete(self, model: str, messages: list, deadline=None, **params) -> str:
+        payload = self.build_payload(model, messages, **params)
+        async with self.semaphore:
+            with track_call(self.name, 'complete'):
+                async with self.http.post(self.url, headers=self.headers, json=payload,
+                                          timeout=self.http.timeout_for(deadline)) as response:
+                    if response.status != 200:
+                        raise ProviderError(self.name, response.status, await response.text())
+                    result = await response.json()
+        record_usage(self.name, result.get('usage'))
+        return result['choices'][0]['message']['content'].strip()
+
+    async def stream(self, model: str, messages: list, deadline=None, **params):
+        """Yield content deltas from a server-sent-events completion stream."""
+        payload = self.build_payload(model, messages, stream=True, **params)
+        async with self.semaphore:
+            with track_call(self.name, 'stream'):
+                async with self.http.post(self.url, headers=self.headers, json=payload,
+                                          timeout=self.http.timeout_for(deadline)) as response:
+                    if response.status != 200:
+                        raise ProviderError(self.name, response.status, await response.text())
+                    async for raw_line in response.content:
+                        line = raw_line.decode('utf-8').strip()
+                        if not line.startswith('data:'):
+                            continue
+                        data = line[5:].strip()
+                        if data == '[DONE]':
+                            break
+                        chunk = json.loads(data)
+                        record_usage(self.name, chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage'))
+                        choices = chunk.get('choices') or []
+                        if choices:
+                            delta = (choices[0].get('delta') or {}).get('content')
+                            if delta:
+                                yield delta
+
+class GroqProvider(LLMProvider):
+    name = "groq"
+
+class TogetherProvider(LLMProvider):
+    name = "together"
+
+class SambaNovaProvider(LLMProvider):
+    name = "sambanova"
+
+PROVIDERS = {
+    "groq": (GroqProvider, GROQ_API_URL, GROQ_API_KEY, GROQ_MAX_CONCURRENCY),
+    "together": (TogetherProvider, TOGETHER_API_URL, TOGETHER_API_KEY, TOGETHER_MAX_CONCURRENCY),
+    "sambanova": (SambaNovaProvider, SAMBANOVA_API_URL, SAMBANOVA_API_KEY, SAMBANOVA_MAX_CONCURRENCY),
+}
+
+class ProviderRegistry:
+    """Holds the LLM provider clients the router calls.
+
+    Clients are built on first use, so startup does no provider work and a
+    provider that is never routed to is never constructed.
+    """
+
+    def __init__(self, http, specs: dict = PROVIDERS):
+        self.http = http
+        self.specs = specs
+        self.providers = {}
+
+    @property
+    def names(self) -> list:
+        return list(self.specs)
+
+    def max_concurrency(self, name: str) -> int:
+        return self.specs[name][3]
+
+    def get(self, name: str) -> LLMProvider:
+        provider = self.providers.get(name)
+        if provider is None:
+            cls, base_url, api_key, max_concurrency = self.specs[name]
+            provider = self.providers[name] = cls(self.http, base_url, api_key, max_concurrency)
+        return provider
@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from config import REPLY_INDEX_SIZE, REPLY_INDEX_TTL
+from utils.state import SQLiteBackend
+
+class ReplyEntry:
+    __slots__ = ('owner', 'user_id', 'expires_at')
+
+    def __init__(self, owner: str, user_id: int, expires_at: float):
+        self.owner = owner
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+class ReplyIndex:
+    """Bounded, TTL-evicting index of bot messages that replies can continue.
+
+    Lets cogs route a reply by its referenced message id alone, without a
+    REST fetch of the referenced message. Entries are kept in insertion
+    order, which is also expiry order, so eviction pops from the front.
+    With a shared state backend entries are also queued for a write there,
+    and `lookup` falls back to reading one on a worker thread, so replies
+    still route after a guild's shard moves to another process.
+    """
+
+    def __init__(self, maxsize: int = REPLY_INDEX_SIZE, ttl: float = REPLY_INDEX_TTL,
+                 state: SQLiteBackend = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.state = state
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, message_id: int, owner: str, user_id: int):
+        self._evict()
+        self._entries[message_id] = ReplyEntry(owner, user_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(message_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        if self.state is not None:
+            self.state.put('reply', message_id, [owner, user_id], self.ttl)
+
+    def track(self, messages: list, owner: str, user_id: int):
+        for message in messages:
+            self.add(message.id, owner, user_id)
+
+    def get(self, message_id: int):
+        entry = self._entries.get(message_id)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[message_id]
+            return None
+        return entry
+
+    async def lookup(self, message, owner: str):
+        """Return the entry if `message` replies to a bot message owned by `owner`."""
+        reference = message.reference
+        if reference is None:
+            return None
+        message_id = reference.message_id or getattr(reference.resolved, 'id', None)
+        if message_id is None:
+            return None
+        entry = self.get(message_id)
+        if entry is None:
+            entry = await self._get_shared(message_id)
+        if entry is None or entry.owner != owner:
+            return None
+        return entry
+
+    async def _get_shared(self, message_id: int):
+        if self.state is None:
+            return None
+        try:
+            saved = await self.state.fetch('reply', message_id)
+        except Exception as e:
+            print(f"Error reading shared reply: {str(e)}")
+            return None
+        return ReplyEntry(saved[0], saved[1], time.monotonic() + self.ttl) if saved else None
+
+    def discard(self, owner: str):
+        for message_id in [key for key, entry in self._entries.items() if entry.owner == owner]:
+            del self._entries[message_id]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            message_id, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[message_id]
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from config import RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_DIR
+from utils.cache import AsyncTTLCache
+
+_PUNCTUATION = re.compile(r'[\s?!.,;:]+$')
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so near-duplicates share a key."""
+    return _PUNCTUATION.sub('', ' '.join(prompt.lower().split()))
+
+class ResponseCache:
+    """LRU/TTL cache of LLM answers keyed by prompt, context and model parameters.
+
+    With a directory configured the cache is loaded from and saved to a JSON
+    snapshot, so answers survive restarts. The bot awaits `load()` at startup,
+    which reads the snapshot on a worker thread; until then the cache is
+    empty and `save()` leaves the snapshot alone.
+    """
+
+    def __init__(self, name: str, ttl: float = RESPONSE_CACHE_TTL, maxsize: int = RESPONSE_CACHE_SIZE,
+                 directory: str = RESPONSE_CACHE_DIR):
+        self.name = name
+        self.cache = AsyncTTLCache(ttl=ttl, maxsize=maxsize, clock=time.time)
+        self.path = os.path.join(directory, f"{name}_responses.json") if directory else None
+        self.hits = 0
+        self.misses = 0
+        self.loaded = False
+
+    def key(self, prompt: str, context: list, params: dict) -> str:
+        fingerprint = json.dumps([context, params], sort_keys=True, separators=(',', ':'))
+        context_hash = hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+        return f"{context_hash}:{normalize_prompt(prompt)}"
+
+    def get(self, prompt: str, context: list, params: dict):
+        found, response = self.cache.get(self.key(prompt, context, params))
+        if found:
+            self.hits += 1
+            return response
+        self.misses += 1
+        return None
+
+    def set(self, prompt: str, context: list, params: dict, response: str):
+        self.cache.set(self.key(prompt, context, params), response)
+
+    async def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if not self.path:
+            return
+        try:
+            entries = await asyncio.to_thread(self._read)
+        except Exception as e:
+            print(f"Failed to load {self.name} response cache: {str(e)}")
+            return
+        for key, response, expires_at in entries:
+            self.cache.restore(key, response, expires_at)
+
+    def _read(self) -> list:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self):
+        if not self.path or not self.loaded:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self.cache.entries()), f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Failed to save {self.name} response cache: {str(e)}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.cache.evictions
+        }
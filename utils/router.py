@@ -0,0 +1,294 @@
+import asyncio
+import time
+from collections import deque
+from utils.metrics import percentile
+from config import (
+    STREAM_RESPONSES,
+    CHAT_PROVIDERS,
+    MATH_PROVIDERS,
+    PROGRAM_PROVIDERS,
+    HEDGE_REQUESTS,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MIN_DELAY,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+)
+
+# Model to use for each command on each provider, plus provider-specific parameters.
+MODELS = {
+    'chat': {
+        'groq': ("llama-3.3-70b-versatile", {}),
+        'together': ("meta-llama/Llama-3.3-70B-Instruct-Turbo", {}),
+        'sambanova': ("Meta-Llama-3.3-70B-Instruct", {}),
+    },
+    'math': {
+        'together': ("Qwen/QwQ-32B-Preview", {"repetition_penalty": 1, "top_k": 50}),
+        'sambanova': ("QwQ-32B-Preview", {}),
+        'groq': ("qwen-qwq-32b", {}),
+    },
+    'program': {
+        'sambanova': ("Qwen2.5-Coder-32B-Instruct", {}),
+        'together': ("Qwen/Qwen2.5-Coder-32B-Instruct", {}),
+        'groq': ("qwen-2.5-coder-32b", {}),
+    },
+}
+
+FALLBACKS = {
+    'chat': CHAT_PROVIDERS,
+    'math': MATH_PROVIDERS,
+    'program': PROGRAM_PROVIDERS,
+}
+
+class RoutingError(Exception):
+    """Raised when every provider in a command's fallback list failed."""
+
+    def __init__(self, command: str, errors: list):
+        details = '; '.join(f"{provider}: {error}" for provider, error in errors)
+        super().__init__(f"all providers failed for {command}: {details}")
+        self.command = command
+        self.errors = errors
+
+class Route:
+    __slots__ = ('provider', 'model', 'params')
+
+    def __init__(self, provider: str, model: str, params: dict):
+        self.provider = provider
+        self.model = model
+        self.params = params
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one probe through per reset period while open."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'half-open':
+            self.opened_at = time.monotonic()
+        return state != 'open'
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold and self.opened_at is None:
+            self.trips += 1
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+class LatencyTracker:
+    """Sliding window of recent latencies for percentile estimates."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float):
+        return percentile(self.samples, q)
+
+class ProviderRouter:
+    """Routes each command to its providers in fallback order.
+
+    Providers with an open circuit are skipped. When the primary has not
+    answered within its observed p95 latency, the next provider is raced
+    against it and whichever answers first wins; the other is cancelled.
+    """
+
+    def __init__(self, registry, models: dict = MODELS, fallbacks: dict = FALLBACKS, hedge: bool = HEDGE_REQUESTS):
+        self.registry = registry
+        self.hedge = hedge
+        self.routes = {
+            command: [Route(provider, *models[command][provider]) for provider in order if provider in models[command]]
+            for command, order in fallbacks.items()
+        }
+        self.breakers = {name: CircuitBreaker(name) for name in registry.names}
+        self.latency = {name: LatencyTracker() for name in registry.names}
+        self.first_token = {name: LatencyTracker() for name in registry.names}
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def primary(self, command: str) -> str:
+        return self.routes[command][0].provider
+
+    def candidates(self, command: str) -> list:
+        """Routes worth trying, in order; the primary alone when every circuit is open.
+
+        This only reads breaker state: a half-open breaker's probe is claimed
+        in `_race` when an attempt on that route actually starts.
+        """
+        routes = self.routes[command]
+        return [route for route in routes if self.breakers[route.provider].state != 'open'] or routes[:1]
+
+    async def complete(self, command: str, messages: list, deadline=None, **params) -> str:
+        return await self._race(
+            command,
+            lambda route: self._complete(route, messages, params, deadline),
+            self.latency,
+            deadline=deadline
+        )
+
+    async def stream(self, command: str, messages: list, deadline=None, **params):
+        """Yield deltas from whichever provider produces a first token first."""
+        stream, first = await self._race(
+            command,
+            lambda route: self._open_stream(route, messages, params, deadline),
+            self.first_token,
+            discard=lambda result: result[0].aclose(),
+            deadline=deadline
+        )
+        try:
+            if first:
+                yield first
+            async for delta in stream:
+                yield delta
+        finally:
+            await stream.aclose()
+
+    async def generate(self, command: str, messages: list, reply=None, deadline=None, **params) -> str:
+        """Complete a prompt, streaming deltas into `reply` when streaming is enabled.
+
+        `deadline` caps every provider request made for it, and no fallback
+        is started once it has passed.
+        """
+        if reply is None or not STREAM_RESPONSES:
+            return await self.complete(command, messages, deadline=deadline, **params)
+
+        parts = []
+        async for delta in self.stream(command, messages, deadline=deadline, **params):
+            parts.append(delta)
+            await reply.push(delta)
+        return ''.join(parts).strip()
+
+    async def _complete(self, route: Route, messages: list, params: dict, deadline=None) -> str:
+        start = time.monotonic()
+        try:
+            result = await self.registry.get(route.provider).complete(
+                route.model, messages, deadline=deadline, **{**params, **route.params}
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.breakers[route.provider].record_failure()
+            raise
+        self.breakers[route.provider].record_success()
+        self.latency[route.provider].record(time.monotonic() - start)
+        return result
+
+    async def _open_stream(self, route: Route, messages: list, params: dict, deadline=None):
+        start = time.monotonic()
+        stream = self.registry.get(route.provider).stream(
+            route.model, messages, deadline=deadline, **{**params, **route.params}
+        )
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = ""
+        except asyncio.CancelledError:
+            await stream.aclose()
+            raise
+        except Exception:
+            self.breakers[route.provider].record_failure()
+            await stream.aclose()
+            raise
+        self.breakers[route.provider].record_success()
+        self.first_token[route.provider].record(time.monotonic() - start)
+        return stream, first
+
+    def _hedge_delay(self, provider: str, trackers: dict):
+        tracker = trackers[provider]
+        if not self.hedge or len(tracker.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, tracker.percentile(0.95))
+
+    async def _race(self, command: str, attempt, trackers: dict, discard=None, deadline=None):
+        candidates = self.candidates(command)
+        # every circuit is open: try the primary anyway rather than fail outright
+        forced = self.breakers[candidates[0].provider].state == 'open'
+        errors = []
+        pending = {}
+        next_index = 0
+        started = 0
+        hedged = False
+
+        def launch() -> bool:
+            nonlocal next_index, started
+            while next_index < len(candidates):
+                route = candidates[next_index]
+                next_index += 1
+                # another request may have claimed a half-open probe since the list was built
+                if self.breakers[route.provider].allow() or forced:
+                    pending[asyncio.ensure_future(attempt(route))] = route
+                    started += 1
+                    return True
+            return False
+
+        try:
+            while True:
+                if not pending:
+                    if (deadline is not None and deadline.expired) or not launch():
+                        raise RoutingError(command, errors)
+                    if started > 1:
+                        self.failovers += 1
+
+                timeout = None
+                if not hedged and len(pending) == 1 and next_index < len(candidates):
+                    timeout = self._hedge_delay(next(iter(pending.values())).provider, trackers)
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        self.hedged += 1
+                    continue
+
+                winner = None
+                for task in done:
+                    route = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append((route.provider, task.exception()))
+                    elif winner is None:
+                        winner = task
+                        if hedged and route is not candidates[0]:
+                            self.hedge_wins += 1
+                    elif discard is not None:
+                        await discard(task.result())
+                if winner is not None:
+                    return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                results = await asyncio.gather(*pending, return_exceptions=True)
+                if discard is not None:
+                    for result in results:
+                        if not isinstance(result, BaseException):
+                            await discard(result)
+
+    def stats(self) -> dict:
+        return {
+            'breakers': {name: breaker.state for name, breaker in self.breakers.items()},
+            'p95': {name: tracker.percentile(0.95) for name, tracker in self.latency.items()},
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'failovers': self.failovers
+        }
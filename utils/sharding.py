@@ -0,0 +1,60 @@
+import multiprocessing
+import time
+from config import SHARD_RESTART_DELAY
+
+def parse_shard_ids(spec: str) -> list:
+    """Parse "0-3,6" into [0, 1, 2, 3, 6]."""
+    shard_ids = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        shard_ids.extend(range(int(start), int(end or start) + 1))
+    return sorted(set(shard_ids))
+
+def split_shards(shard_count: int, processes: int) -> list:
+    """Spread shard ids 0..shard_count-1 over `processes` contiguous ranges."""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+def launch(target, shard_count: int, processes: int, restart_delay: float = SHARD_RESTART_DELAY):
+    """Run `target(shard_ids, shard_count, worker_index)` in one process per shard range.
+
+    Workers that exit are restarted after `restart_delay` seconds; Ctrl+C
+    stops them all.
+    """
+    ranges = split_shards(shard_count, processes)
+    workers = {}
+
+    def spawn(index: int):
+        process = multiprocessing.Process(
+            target=target, args=(ranges[index], shard_count, index), name=f"lacri-shards-{index}"
+        )
+        process.start()
+        workers[index] = process
+        print(f"Started worker {index} (pid {process.pid}) for shards {ranges[index][0]}-{ranges[index][-1]}")
+
+    for index in range(len(ranges)):
+        spawn(index)
+    try:
+        while True:
+            time.sleep(1)
+            for index, process in list(workers.items()):
+                if not process.is_alive():
+                    print(f"Worker {index} exited with code {process.exitcode}, restarting in {restart_delay}s")
+                    time.sleep(restart_delay)
+                    spawn(index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join()
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from config import STATE_BACKEND, STATE_PATH
+
+class SQLiteBackend:
+    """Namespaced key/value store with per-entry expiry, shared between processes.
+
+    Lives in a local SQLite file in WAL mode, so every shard process on the
+    host sees the same entries. Conversations, reply routing and per-user
+    rate limits use it when STATE_BACKEND configures it, and their own local
+    structures otherwise. Values must be JSON-serialisable and expiry uses
+    wall-clock time so entries stay meaningful across processes.
+
+    The SQLite calls block, so the event loop never calls them directly:
+    `fetch` reads on a worker thread, and `put` queues a write that a
+    background task flushes in batches, keeping only the latest value per key.
+    """
+
+    def __init__(self, path: str = STATE_PATH, purge_every: int = 1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushing = {}
+        self._wake = None
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+
+    def get(self, namespace: str, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, str(key), time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def fetch(self, namespace: str, key):
+        """`get` on a worker thread."""
+        return await asyncio.to_thread(self.get, namespace, key)
+
+    def put(self, namespace: str, key, value, ttl: float):
+        """Queue a write for the background flush; a later put for the same key replaces it."""
+        self._pending[(namespace, str(key))] = (value, time.time() + ttl)
+        if self._wake is not None:
+            self._wake.set()
+
+    def pending(self, namespace: str, key) -> bool:
+        """Whether a put for the key hasn't reached the backend yet."""
+        entry = (namespace, str(key))
+        return entry in self._pending or entry in self._flushing
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        with self._lock:
+            self._db.close()
+
+    async def flush(self):
+        """Write every queued put, once each, on a worker thread."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write, self._flushing)
+            except Exception as e:
+                print(f"Error writing shared state: {str(e)}")
+            finally:
+                self._flushing = {}
+
+    async def _flush_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await self.flush()
+
+    def _write(self, entries: dict):
+        rows = [
+            (namespace, key, json.dumps(value, separators=(',', ':')), expires_at)
+            for (namespace, key), (value, expires_at) in entries.items()
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)", rows
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            before = self._writes
+            self._writes += len(rows)
+        if before // self.purge_every != self._writes // self.purge_every:
+            self.purge()
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM state WHERE expires_at <= ?", (time.time(),)).rowcount
+
+def create_state_backend(kind: str = STATE_BACKEND):
+    """Return the configured shared backend, or None to keep state in-process."""
+    if kind == 'sqlite':
+        return SQLiteBackend()
+    if kind != 'memory':
+        print(f"Unknown STATE_BACKEND '{kind}', keeping state in memory")
+    return None
@@ -0,0 +1,229 @@
+import io
+import re
+import time
+import nextcord
+from config import STREAM_EDIT_INTERVAL, DISCORD_MESSAGE_LIMIT, OUTBOUND_MAX_MESSAGES
+
+_FENCE_LINE = re.compile(r'^[ \t]*```[^\n`]*$', re.MULTILINE)
+CLOSE_FENCE = "\n```"
+ATTACHMENT_PREVIEW_CHARS = 600
+ATTACHMENT_NOTE = "\n\n*this one ran long... the full answer is attached.*"
+
+def open_fence(text: str):
+    """Opening fence line (e.g. "```python") of the code block `text` ends inside, or None."""
+    fence = None
+    for match in _FENCE_LINE.finditer(text):
+        line = match.group(0).strip()
+        if fence is None:
+            fence = line
+        elif line == "```":
+            fence = None
+    return fence
+
+def split_point(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> int:
+    """Index to cut text at so the head fits in one message.
+
+    A paragraph break is taken if one falls in the last quarter of the
+    window, otherwise the last line break, then the last space, so chunks
+    stay close to the limit.
+    """
+    if len(text) <= limit:
+        return len(text)
+    cut = text.rfind('\n\n', limit * 3 // 4, limit)
+    if cut <= 0:
+        cut = text.rfind('\n', 0, limit)
+    if cut <= 0:
+        cut = text.rfind(' ', 0, limit)
+    if cut <= 0:
+        cut = limit
+    return cut
+
+def split_chunk(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> tuple:
+    """Split off one message's worth of text as (head, rest).
+
+    A code block cut in two is closed at the end of the head and reopened,
+    with its language tag, at the start of the rest.
+    """
+    if len(text) <= limit:
+        return text, ""
+    cut = split_point(text, limit)
+    if open_fence(text[:cut]) is not None:
+        cut = split_point(text, limit - len(CLOSE_FENCE))
+    head, rest = text[:cut].rstrip(), text[cut:].lstrip('\n')
+    fence = open_fence(head)
+    if fence is None:
+        return head, rest
+
+    line_start = head.rfind('\n') + 1
+    if line_start > 0 and head[line_start:].strip() == fence:
+        # the cut landed just after an opening fence; move the whole block to the next chunk
+        return head[:line_start].rstrip(), f"{fence}\n{rest}"
+    reopened = f"{fence}\n{rest}"
+    if len(reopened) >= len(text):
+        # too little code before the cut to be worth a fence pair; cut hard instead
+        cut = limit - len(CLOSE_FENCE)
+        head, reopened = text[:cut], f"{fence}\n{text[cut:]}"
+    return head + CLOSE_FENCE, reopened
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> list:
+    chunks = []
+    while text:
+        head, text = split_chunk(text, limit)
+        if head.strip():
+            chunks.append(head)
+    return chunks
+
+class StreamingReply:
+    """Progressively renders a streamed completion into Discord messages.
+
+    `send` is a coroutine function that posts a new message and returns it
+    (e.g. a followup send or ctx.reply). Edits are throttled to
+    `edit_interval` seconds to stay under Discord's edit rate limit, and the
+    text rolls over into a new message once it passes the length limit,
+    keeping code fences balanced. Given a `lane` from the outbound pipeline,
+    every send, edit and delete is paced through it. An answer that would
+    need more than `max_messages` messages is sent as one short preview with
+    the full text attached as a file. `formatter` is an optional factory for
+    an incremental formatter (see utils.code_format) applied to every delta.
+    """
+
+    def __init__(self, send, prefix: str = "", edit_interval: float = STREAM_EDIT_INTERVAL,
+                 limit: int = DISCORD_MESSAGE_LIMIT, lane=None, max_messages: int = OUTBOUND_MAX_MESSAGES,
+                 formatter=None):
+        self.send = send
+        self.prefix = prefix
+        self.edit_interval = edit_interval
+        self.limit = limit
+        self.lane = lane
+        self.max_messages = max_messages
+        self.overflowed = False
+        self.formatter_factory = formatter
+        self.formatter = formatter() if formatter else None
+        self.text = prefix
+        self.received = ""
+        self.message = None
+        self.messages = []
+        self.rendered = None
+        self.last_edit = 0.0
+
+    async def push(self, delta: str):
+        if not self.received:
+            delta = delta.lstrip()
+            if not delta:
+                return
+        self.received += delta
+        if self.formatter is not None:
+            delta = self.formatter.feed(delta)
+        await self._extend(delta)
+
+    async def _extend(self, delta: str):
+        if self.overflowed or not delta:
+            return
+        self.text += delta
+
+        while len(self.text) > self.limit:
+            if len(self.messages) + (self.message is None) >= self.max_messages:
+                # the answer will go out as an attachment; stop posting messages
+                self.overflowed = True
+                return
+            head, self.text = split_chunk(self.text, self.limit)
+            await self._render(head)
+            self.message = None
+
+        if time.monotonic() - self.last_edit >= self.edit_interval:
+            await self._render(self.text)
+
+    async def finish(self, full_text: str):
+        """Flush the final text; rewrites the messages if it diverged from what was streamed."""
+        display = self._format(full_text)
+        remainder = self._remainder(full_text)
+        if len(split_message(self.prefix + display, self.limit)) > self.max_messages:
+            await self.attach(display)
+        elif not self.overflowed and remainder is not None:
+            if remainder:
+                await self.push(remainder)
+            if self.formatter is not None:
+                await self._extend(self.formatter.flush())
+            if self.overflowed:
+                await self.attach(display)
+            else:
+                await self._render(self.text)
+        else:
+            await self.rewrite(display)
+        return self.messages
+
+    def _format(self, full_text: str) -> str:
+        if self.formatter_factory is None:
+            return full_text
+        formatter = self.formatter_factory()
+        return formatter.feed(full_text) + formatter.flush()
+
+    def _remainder(self, full_text: str):
+        """The part of `full_text` not streamed yet, or None if it no longer extends the stream."""
+        if full_text.startswith(self.received):
+            return full_text[len(self.received):]
+        if full_text.rstrip() == self.received.rstrip():
+            return ""
+        return None
+
+    async def rewrite(self, full_text: str):
+        chunks = split_message(self.prefix + full_text, self.limit)
+        for i, chunk in enumerate(chunks):
+            if i < len(self.messages):
+                await self._call(self.messages[i].edit, content=chunk)
+            else:
+                self.messages.append(await self._call(self.send, chunk))
+        for message in self.messages[len(chunks):]:
+            await self._call(message.delete)
+        self.messages = self.messages[:len(chunks)]
+        self.message = self.messages[-1] if self.messages else None
+        self.text = chunks[-1] if chunks else ""
+        self.rendered = self.text
+        self.received = full_text
+
+    async def attach(self, full_text: str):
+        """Collapse the reply into one preview message carrying the full answer as a file."""
+        preview, _ = split_chunk(self.prefix + full_text, ATTACHMENT_PREVIEW_CHARS)
+        content = preview + ATTACHMENT_NOTE
+        file = nextcord.File(io.BytesIO(full_text.encode('utf-8')), filename="response.md")
+        if self.messages:
+            await self._call(self.messages[0].edit, content=content, file=file)
+            for message in self.messages[1:]:
+                await self._call(message.delete)
+            self.messages = self.messages[:1]
+        else:
+            self.messages.append(await self._call(self.send, content, file=file))
+        self.message = self.messages[0]
+        self.text = self.rendered = content
+        self.received = full_text
+        if self.lane is not None:
+            self.lane.pipeline.attachments += 1
+
+    async def _call(self, call, *args, **kwargs):
+        if self.lane is None:
+            return await call(*args, **kwargs)
+        return await self.lane.run(call, *args, **kwargs)
+
+    async def _render(self, content: str):
+        if not content.strip() or (content == self.rendered and self.message is not None):
+            return
+        if self.message is None:
+            self.message = await self._call(self.send, content)
+            self.messages.append(self.message)
+        else:
+            await self._call(self.message.edit, content=content)
+        self.rendered = content
+        self.last_edit = time.monotonic()
+
+def interaction_sender(interaction):
+    """Build a StreamingReply send function for a slash command interaction.
+
+    The first message answers the interaction directly when it was not
+    deferred (e.g. a cache hit); everything else goes out as a followup.
+    """
+    async def send(content: str, **kwargs):
+        if not interaction.response.is_done():
+            await interaction.response.send_message(content, **kwargs)
+            return await interaction.original_message()
+        return await interaction.followup.send(content, wait=True, **kwargs)
+    return send
@@ -1,23 +1,125 @@
-import aiohttp
-from config import WEATHER_API_KEY
+import asyncio
+import re
+from config import (
+    WEATHER_API_KEY,
+    WEATHER_API_URL,
+    WEATHER_CACHE_TTL,
+    WEATHER_CACHE_NEGATIVE_TTL,
+    WEATHER_CACHE_SIZE,
+    WEATHER_FETCH_CONCURRENCY,
+)
+from utils.cache import AsyncTTLCache
+from utils.metrics import track_call
 
-async def get_weather(city: str):
-    """Get weather data from OpenWeatherMap API."""
+WEATHER_URL = f"{WEATHER_API_URL.rstrip('/')}/weather"
+
+_PLACE_SEPARATORS = re.compile(r"\s*(?:[;|/&]|\bvs\b\.?)\s*", re.IGNORECASE)
+_PART_SEPARATORS = re.compile(r"\s*(?:,|\band\b)\s*", re.IGNORECASE)
+_LOCATION_CODE = re.compile(r"[a-z]{2}", re.IGNORECASE)
+
+weather_cache = AsyncTTLCache(
+    ttl=WEATHER_CACHE_TTL,
+    maxsize=WEATHER_CACHE_SIZE,
+    negative_ttl=WEATHER_CACHE_NEGATIVE_TTL
+)
+
+class WeatherAPIError(Exception):
+    """Transient upstream failure; never negative-cached."""
+
+    def __init__(self, status: int):
+        super().__init__(f"OpenWeatherMap returned {status}")
+        self.status = status
+
+class WeatherUnavailable(Exception):
+    """Raised by get_weather when a city's weather can't be fetched right now."""
+
+    def __init__(self, city: str):
+        super().__init__(f"weather for {city} is unavailable")
+        self.city = city
+
+def normalize_city(city: str) -> str:
+    return ' '.join(city.lower().split())
+
+def split_places(text: str) -> list:
+    """Split on separators that always mean another city: ";", "|", "/", "&" and "vs"."""
+    return [chunk.strip() for chunk in _PLACE_SEPARATORS.split(text) if chunk.strip()]
+
+def split_place(text: str) -> list:
+    """Split one place on commas and "and", which may also just qualify it ("portland, oregon").
+
+    A two-letter part is a country or state code and stays with the part
+    before it ("paris, fr" -> ["paris, fr"]). Whether the split is meant
+    is for the caller to decide.
+    """
+    parts = []
+    for part in _PART_SEPARATORS.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        if parts and _LOCATION_CODE.fullmatch(part):
+            parts[-1] = f"{parts[-1]}, {part}"
+        else:
+            parts.append(part)
+    return parts
+
+def unique_cities(cities: list) -> list:
+    seen = set()
+    unique = []
+    for city in cities:
+        if normalize_city(city) not in seen:
+            seen.add(normalize_city(city))
+            unique.append(city)
+    return unique
+
+async def fetch_weather(http, city: str):
+    """Fetch weather from OpenWeatherMap; None means the city does not exist."""
+    params = {'q': city, 'appid': WEATHER_API_KEY, 'units': 'metric'}
+    with track_call('openweathermap', 'weather'):
+        async with http.get(WEATHER_URL, params=params) as response:
+            if response.status == 404:
+                return None
+            if response.status != 200:
+                raise WeatherAPIError(response.status)
+            data = await response.json()
+    return {
+        'temp': round(data['main']['temp']),
+        'feels_like': round(data['main']['feels_like']),
+        'humidity': data['main']['humidity'],
+        'description': data['weather'][0]['description'],
+        'wind_speed': data['wind']['speed']
+    }
+
+async def get_weather(http, city: str):
+    """Get weather data, served from the shared cache when fresh.
+
+    None means the city does not exist; upstream failures raise
+    WeatherUnavailable instead, so they are never cached as missing.
+    """
+    key = normalize_city(city)
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={WEATHER_API_KEY}&units=metric"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return {
-                        'temp': round(data['main']['temp']),
-                        'feels_like': round(data['main']['feels_like']),
-                        'humidity': data['main']['humidity'],
-                        'description': data['weather'][0]['description'],
-                        'wind_speed': data['wind']['speed']
-                    }
-                else:
-                    return None
+        return await weather_cache.get_or_fetch(key, lambda: fetch_weather(http, key))
     except Exception as e:
         print(f"Error fetching weather: {str(e)}")
-        return None
\ No newline at end of file
+        raise WeatherUnavailable(key) from e
+
+async def get_weather_many(http, cities: list, concurrency: int = WEATHER_FETCH_CONCURRENCY) -> list:
+    """Get weather for several cities at once, with at most `concurrency` upstream requests in flight.
+
+    Returns (city, weather, error) per city in the given order, where error
+    is None, 'not found' or 'unavailable'; one city failing never fails
+    the others.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(key: str):
+        found, weather = weather_cache.get(key)
+        if not found:
+            async with semaphore:
+                try:
+                    weather = await weather_cache.get_or_fetch(key, lambda: fetch_weather(http, key))
+                except Exception as e:
+                    print(f"Error fetching weather for {key}: {str(e)}")
+                    return key, None, 'unavailable'
+        return key, weather, None if weather else 'not found'
+
+    return list(await asyncio.gather(*(one(normalize_city(city)) for city in cities)))
@@ -0,0 +1,277 @@
+import asyncio
+import heapq
+import json
+from contextlib import nullcontext
+from config import (
+    WEATHER_DIGEST_TTL,
+    WEATHER_DIGEST_CACHE_SIZE,
+    WEATHER_DIGEST_REFRESH_INTERVAL,
+    WEATHER_CACHE_NEGATIVE_TTL,
+    WEATHER_HOT_CITIES,
+    WEATHER_POPULARITY_DECAY,
+    WEATHER_MAX_CITIES,
+)
+from utils.cache import AsyncTTLCache
+from utils.weather_api import (
+    WeatherUnavailable,
+    get_weather,
+    get_weather_many,
+    normalize_city,
+    split_place,
+    split_places,
+    unique_cities,
+    weather_cache,
+)
+
+DIGEST_PROMPT = """you are lacri.ai, an AI with the calm, analytical personality of dexter morgan.
+write a short weather digest (2-4 sentences) from the json data you are given: how it actually feels outside and one practical suggestion.
+always type in lowercase. no greetings, no lists, no repeating every number back."""
+
+COMPARE_PROMPT = """you are lacri.ai, an AI with the calm, analytical personality of dexter morgan.
+compare the weather in these cities (3-5 sentences) from the json data you are given: where it's nicest right now, where it's worst, and one practical suggestion.
+always type in lowercase. no greetings, no lists, no repeating every number back."""
+
+DIGEST_PARAMS = {"temperature": 0.7, "max_tokens": 300, "top_p": 0.9}
+COMPARE_PARAMS = {**DIGEST_PARAMS, "max_tokens": 400}
+CITY_ERRORS = {
+    'not found': "couldn't find this one",
+    'unavailable': "the weather service didn't answer... try again in a bit",
+}
+
+def group_key(keys: list) -> str:
+    return ' | '.join(keys)
+
+def weather_line(city: str, weather: dict) -> str:
+    return (
+        f"**{city}** · {weather['temp']}°C (feels like {weather['feels_like']}°C) · {weather['description']} · "
+        f"{weather['humidity']}% humidity · wind {weather['wind_speed']} m/s"
+    )
+
+class WeatherDigestEngine:
+    """Shared LLM weather digests, one per city, precomputed for popular cities.
+
+    Each digest comes from a single LLM call over the structured weather
+    data and is served to every user asking about that city until it
+    expires. Request counts decay every refresh cycle; the hottest cities
+    are refreshed in the background before their digests expire, so only
+    cold cities are computed on demand, and concurrent requests for the
+    same cold city share one computation.
+    """
+
+    def __init__(self, router, http, ttl: float = WEATHER_DIGEST_TTL,
+                 maxsize: int = WEATHER_DIGEST_CACHE_SIZE,
+                 refresh_interval: float = WEATHER_DIGEST_REFRESH_INTERVAL,
+                 hot_size: int = WEATHER_HOT_CITIES, decay: float = WEATHER_POPULARITY_DECAY):
+        self.router = router
+        self.http = http
+        self.digests = AsyncTTLCache(ttl=ttl, maxsize=maxsize, negative_ttl=WEATHER_CACHE_NEGATIVE_TTL)
+        self.refresh_interval = refresh_interval
+        self.hot_size = hot_size
+        self.decay = decay
+        self.popularity = {}
+        self.refreshed = 0
+        self.refresh_errors = 0
+        self._task = None
+
+    def ready(self, city: str) -> bool:
+        """Whether a digest (or a known-missing city) can be served without upstream calls."""
+        found, _ = self.digests.get(normalize_city(city))
+        return found
+
+    def ready_group(self, cities: list) -> bool:
+        found, _ = self.digests.get(group_key([normalize_city(city) for city in cities]))
+        return found
+
+    def _known(self, city: str):
+        """Whether a city exists according to the caches alone; None when they don't know."""
+        key = normalize_city(city)
+        for cache in (self.digests, weather_cache):
+            found, value = cache.get(key)
+            if found:
+                return value is not None
+        return None
+
+    async def _exists(self, city: str) -> bool:
+        known = self._known(city)
+        if known is not None:
+            return known
+        try:
+            return await get_weather(self.http, city) is not None
+        except WeatherUnavailable:
+            return False
+
+    def resolve_cached(self, text: str):
+        """Like `resolve`, answered from the caches alone; None when that needs upstream lookups."""
+        cities = []
+        for chunk in split_places(text):
+            parts = split_place(chunk)
+            if len(parts) > 1:
+                whole = self._known(chunk)
+                if whole is None:
+                    return None
+                if not whole:
+                    known = [self._known(part) for part in parts[:WEATHER_MAX_CITIES]]
+                    if any(known):
+                        cities += parts
+                        continue
+                    if None in known:
+                        return None
+            cities.append(chunk)
+        return unique_cities(cities) or [text]
+
+    async def resolve(self, text: str) -> list:
+        """The cities a /weather query names, in order.
+
+        ";", "/", "&" and "vs" always separate cities. Commas and "and" only
+        do when the whole phrase isn't a place itself but one of its parts
+        is, so "portland, oregon" stays one city and "london, paris" is two.
+        Every lookup goes through the weather cache, so fetching the
+        resolved cities afterwards costs nothing extra.
+        """
+        cities = []
+        for chunk in split_places(text):
+            parts = split_place(chunk)
+            if len(parts) > 1 and not await self._exists(chunk):
+                results = await get_weather_many(self.http, parts[:WEATHER_MAX_CITIES])
+                if any(weather for _, weather, _ in results):
+                    cities += parts
+                    continue
+            cities.append(chunk)
+        return unique_cities(cities) or [text]
+
+    def _track(self, key: str):
+        if key in self.popularity or len(self.popularity) < self.digests.maxsize * 8:
+            self.popularity[key] = self.popularity.get(key, 0.0) + 1
+
+    async def get(self, city: str, slot=None):
+        """Return (weather, digest) for a city, or None if it does not exist.
+
+        `slot` is the admission slot of the request that triggers a cold
+        computation; callers that join an in-flight computation don't use
+        theirs. digest is None when the LLM call failed. Raises
+        WeatherUnavailable when the weather itself couldn't be fetched.
+        """
+        key = normalize_city(city)
+        self._track(key)
+        try:
+            return await self.digests.get_or_fetch(key, lambda: self._build(key, slot))
+        except WeatherUnavailable:
+            raise
+        except Exception as e:
+            print(f"Error building weather digest: {str(e)}")
+            # the weather was fetched before the LLM call failed, so it is in the cache
+            found, weather = weather_cache.get(key)
+            if not found:
+                raise WeatherUnavailable(key) from e
+            return (weather, None) if weather else None
+
+    def render(self, city: str, weather: dict, digest: str = None) -> str:
+        line = weather_line(normalize_city(city), weather)
+        if digest is None:
+            return f"{line}\n\nmy analysis is offline right now... the numbers will have to speak for themselves."
+        return f"{line}\n\n{digest}"
+
+    async def _build(self, key: str, slot=None):
+        weather = await get_weather(self.http, key)
+        if weather is None:
+            return None
+        messages = [
+            {"role": "system", "content": DIGEST_PROMPT},
+            {"role": "user", "content": json.dumps({"city": key, **weather})}
+        ]
+        async with slot or nullcontext():
+            digest = await self.router.complete("chat", messages, **DIGEST_PARAMS)
+        return weather, digest
+
+    async def get_group(self, cities: list, slot=None):
+        """Return ([(city, weather, error), ...], digest) for several cities, or None if none exist.
+
+        Weather is fetched concurrently and the found cities are compared in
+        one LLM call, cached like a single-city digest. A set with cities
+        the weather service failed on is not cached, so a retry fetches
+        them again. digest is None when the LLM call failed.
+        """
+        keys = [normalize_city(city) for city in cities]
+        for key in keys:
+            self._track(key)
+        key = group_key(keys)
+        try:
+            value = await self.digests.get_or_fetch(key, lambda: self._build_group(keys, slot))
+        except Exception as e:
+            print(f"Error building weather comparison: {str(e)}")
+            results = await get_weather_many(self.http, keys)
+            return None if all(error == 'not found' for _, _, error in results) else (results, None)
+        if value is not None and any(error == 'unavailable' for _, _, error in value[0]):
+            self.digests.invalidate(key)
+        return value
+
+    def render_group(self, results: list, digest: str = None) -> str:
+        lines = [
+            weather_line(city, weather) if weather else f"**{city}** · {CITY_ERRORS[error]}"
+            for city, weather, error in results
+        ]
+        if not any(weather for _, weather, _ in results):
+            return '\n'.join(lines)
+        if digest is None:
+            digest = "my analysis is offline right now... the numbers will have to speak for themselves."
+        return '\n'.join(lines) + f"\n\n{digest}"
+
+    async def _build_group(self, keys: list, slot=None):
+        results = await get_weather_many(self.http, keys)
+        found = {city: weather for city, weather, _ in results if weather}
+        if not found:
+            return None if all(error == 'not found' for _, _, error in results) else (results, None)
+        messages = [
+            {"role": "system", "content": COMPARE_PROMPT},
+            {"role": "user", "content": json.dumps([{"city": city, **weather} for city, weather in found.items()])}
+        ]
+        async with slot or nullcontext():
+            digest = await self.router.complete("chat", messages, **COMPARE_PARAMS)
+        return results, digest
+
+    def hot_cities(self) -> list:
+        ranked = heapq.nlargest(self.hot_size, self.popularity.items(), key=lambda item: item[1])
+        return [city for city, score in ranked if score >= 2]
+
+    async def refresh(self):
+        """Recompute digests for the hottest cities, then decay every city's count."""
+        for city in self.hot_cities():
+            weather_cache.invalidate(city)
+            try:
+                value = await self._build(city)
+                self.digests.set(city, value)
+                self.refreshed += 1
+            except Exception as e:
+                # the previous digest stays in place until it expires
+                self.refresh_errors += 1
+                print(f"Error refreshing weather digest for {city}: {str(e)}")
+        self.popularity = {
+            city: score * self.decay for city, score in self.popularity.items() if score * self.decay >= 0.1
+        }
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    def stats(self) -> dict:
+        return {
+            **self.digests.stats(),
+            'tracked_cities': len(self.popularity),
+            'hot_cities': len(self.hot_cities()),
+            'refreshed': self.refreshed,
+            'refresh_errors': self.refresh_errors
+        }